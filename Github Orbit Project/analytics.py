@@ -0,0 +1,136 @@
+import json
+from collections import deque
+from vector_gravity import *
+from config import *
+from orbits import *
+from scenarios import sampled_potential_energy
+
+"""Analytics follows a run in bounded memory: events (merges, ejections, unbound orbits, close approaches)
+and, every 'stride' steps, a sample of the conserved totals and their drift, optionally streamed to a sink as JSON lines."""
+class Analytics:
+    def __init__(self, stride=10, primary_ID=None, close_distance=0.01*Config.AU, window=1000, max_events=10000,
+                 orbits_every=0, sink=None, exact_limit=1000):
+        self.stride, self.primary_ID, self.close_distance = stride, primary_ID, close_distance
+        self.orbits_every, self.sink, self.exact_limit = orbits_every, sink, exact_limit
+        self.samples, self.events = deque(maxlen=window), deque(maxlen=max_events)
+        self.reference = None                           # Totals of the first sample
+        self.close = np.zeros(0, dtype=np.int64)        # ID pairs (as ID << 32 | ID) within close_distance, last sample
+        self.unbound = set()                            # IDs on hyperbolic orbits about the primary, last sample
+        self.orbits, self.steps, self.sampled = None, 0, 0
+
+    def observe(self, model, time):
+        self.steps += 1
+        for M, cluster in model.merged: self.emit(self.merge_event(M, cluster, time))
+        for n in model.escaped:
+            self.emit({'type': 'ejection', 'time': time, 'ID': n.ID, 'm': float(n.m), 's': [float(x) for x in n.s],
+                       'v': [float(x) for x in n.v]})
+        if self.steps % self.stride: return
+        state, G = model.state, model.main.G
+        state.absorb()
+        sample = dict(type='sample', step=self.steps, time=time, **self.totals(state, G))
+        if self.reference is None: self.reference = sample
+        ref = self.reference
+        scale = lambda x: abs(x) if x else 1.0
+        sample['energy_drift'] = (sample['energy'] - ref['energy'])/scale(ref['energy'])
+        sample['momentum_drift'] = float(np.hypot(*np.subtract(sample['momentum'], ref['momentum'])))/scale(ref['momentum_scale'])
+        sample['angular_momentum_drift'] = (sample['angular_momentum'] - ref['angular_momentum'])/scale(ref['angular_momentum'])
+        self.samples.append(sample)
+        self.write(sample)
+        self.orbits = self.find_orbits(model)
+        self.sampled += 1
+        self.unbound_events(time)
+        self.close_approach_events(state, time)
+        if self.orbits is not None and self.orbits_every and self.sampled % self.orbits_every == 0:
+            self.write(dict(type='orbits', step=self.steps, time=time, **{k: v.tolist() if hasattr(v, 'tolist') else v
+                                                                         for k, v in self.orbits.items()}))
+
+    def totals(self, state, G):
+        m, s, v, p = state.m, state.s, state.v, state.p
+        N = len(state)
+        kinetic = float(0.5*(m*(v[:,0]**2 + v[:,1]**2)).sum())
+        estimated = N > self.exact_limit
+        potential = float(potential_energy(m, s, G, self.exact_limit))
+        return {'bodies': N, 'mass': float(m.sum()), 'kinetic': kinetic, 'potential': potential, 'potential_estimated': estimated,
+                'energy': kinetic + potential, 'momentum': [float(x) for x in p.sum(0)],
+                'momentum_scale': float(np.sqrt(p[:,0]**2 + p[:,1]**2).sum()),
+                'angular_momentum': float((s[:,0]*p[:,1] - s[:,1]*p[:,0]).sum()),
+                'center_of_mass': [float(x) for x in (m[:,None]*s).sum(0)/m.sum()] if N else [0.0, 0.0]}
+
+    # Orbital elements of every other body about the primary: {'primary_ID', 'ID', 'a', 'e', 'period'}.
+    def find_orbits(self, model):
+        state = model.state
+        if len(state) < 2: return None
+        if self.primary_ID is None: primary = int(np.argmax(state.m))
+        else:
+            n = model.find(self.primary_ID, follow=True)
+            if n is None: return None
+            primary = n.index
+        others = np.flatnonzero(np.arange(len(state)) != primary)
+        a, e, period = orbital_elements(state.s[others] - state.s[primary], state.v[others] - state.v[primary],
+                                        model.main.G*(state.m[primary] + state.m[others]))
+        return {'primary_ID': int(state.ids[primary]), 'ID': state.ids[others], 'a': a, 'e': e, 'period': period}
+
+    def merge_event(self, M, cluster, time):
+        m = np.array([float(n.m) for n in cluster])
+        v = np.array([[float(x) for x in n.v] for n in cluster])
+        kinetic_before = 0.5*(m*(v**2).sum(1)).sum()
+        kinetic_after = 0.5*m.sum()*float(np.sum(np.square(M.v)))
+        return {'type': 'merge', 'time': time, 'ID': M.ID, 'from': [n.ID for n in cluster], 'm': float(M.m),
+                's': [float(x) for x in M.s], 'kinetic_energy_lost': float(kinetic_before - kinetic_after)}
+
+    def unbound_events(self, time):
+        if self.orbits is None: return
+        now = set(self.orbits['ID'][self.orbits['e'] >= 1].tolist())
+        for ID in sorted(now - self.unbound):
+            self.emit({'type': 'unbound', 'time': time, 'ID': ID, 'primary_ID': self.orbits['primary_ID']})
+        self.unbound = now
+
+    # Pairs found with the collision broad phase: a reach of half the distance covers every pair that close.
+    def close_approach_events(self, state, time):
+        if not self.close_distance or len(state) < 2: return
+        i, j = SpatialHash(state.s, np.full(len(state), self.close_distance/2)).pairs()
+        r = state.s[j] - state.s[i]
+        d = np.sqrt(r[:,0]**2 + r[:,1]**2)
+        near = d < self.close_distance
+        i, j, d = i[near], j[near], d[near]
+        lo, hi = np.minimum(state.ids[i], state.ids[j]), np.maximum(state.ids[i], state.ids[j])
+        keys = (lo << 32) | hi
+        for k in np.flatnonzero(~np.isin(keys, self.close)):
+            dv = state.v[j[k]] - state.v[i[k]]
+            self.emit({'type': 'close_approach', 'time': time, 'ID': [int(lo[k]), int(hi[k])], 'distance': float(d[k]),
+                       'relative_speed': float(np.hypot(*dv))})
+        self.close = keys
+
+    def emit(self, event):
+        self.events.append(event)
+        self.write(event)
+
+    def write(self, record):
+        if self.sink is not None: self.sink.write(json.dumps(record) + "\n")
+
+
+# W = -G * sum over pairs of m_i m_j / r_ij. Up to exact_limit bodies it is summed exactly; above that the pairs
+# involving the 'heavy' most massive bodies (a star and its planets, which dominate W) are still summed exactly
+# and the rest is estimated from a random sample of pairs of the lighter bodies. The sample is drawn with the same seed
+# every time, so the estimate's error changes slowly along a run rather than adding noise to the energy drift.
+# Arguments in the order of scenarios.sampled_potential_energy.
+def potential_energy(m, s, G, exact_limit=1000, heavy=64, pairs=10**5):
+    N = len(m)
+    if N <= exact_limit: return -0.5*G*pair_sum(m, s, m, s)
+    heavy = min(heavy, N)
+    H = np.argpartition(m, N - heavy)[N - heavy:]
+    light = np.ones(N, dtype=bool)
+    light[H] = False
+    W = pair_sum(m[H], s[H], m, s) - 0.5*pair_sum(m[H], s[H], m[H], s[H])
+    return -G*W + sampled_potential_energy(m[light], s[light], G, pairs, np.random.default_rng(0))
+
+# Sum of m_i m_j / r_ij over every row i against every column j at a different position, a block of rows at a time.
+def pair_sum(m_rows, s_rows, m, s, rows=256):
+    total = 0.0
+    for start in range(0, len(m_rows), rows):
+        r = s[None,:,:] - s_rows[start:start + rows,None,:]
+        d = np.sqrt(r[...,0]**2 + r[...,1]**2)
+        with np.errstate(divide='ignore'):
+            inv = np.where(d > 0, 1/d, 0)
+        total += float((m_rows[start:start + rows,None]*m[None,:]*inv).sum())
+    return total
@@ -0,0 +1,174 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from vector_gravity import *
+from config import *
+from scenarios import bodies, star, build, keplerian_disk, PALETTE
+
+"""Benchmarks time every stage of the Gravitation step pipeline and the full step, for several engines on
+synthetic systems, and compare result files to spot regressions between versions."""
+MAX_BODIES = {'list': 300, 'direct': 3000, 'parallel': 20000, 'tree': 100000}
+ENGINES = {'list': (Gravitation, {}),
+           'direct': (VectorGravitation, {}),
+           'parallel': (VectorGravitation, {'WORKERS': max(2, multiprocessing.cpu_count())}),
+           'tree': (VectorGravitation, {'SOLVER': 'tree'})}
+
+
+def circular_velocity(s, M, G=Config.G):
+    r = np.sqrt(s[:,0]**2 + s[:,1]**2)
+    speed = np.sqrt(G*M/r)
+    return np.stack([-speed*s[:,1]/r, speed*s[:,0]/r], axis=1)
+
+# A star with bodies spread uniformly over a disk on circular orbits
+def uniform_disk(N, seed, AU=Config.AU):
+    return build(keplerian_disk(N - 1, central_mass=2*10**30, r_min=0.3*AU, r_max=2.5*AU, power=0,
+                                mass_range=(10**22, 10**24), avg_density=2000, seed=seed))
+
+# A star with three narrow belts of clumped bodies with a power law of masses
+def clustered_belts(N, seed, AU=Config.AU, clumps=12):
+    rng = np.random.default_rng(seed)
+    M = 2*10**30
+    belt = rng.integers(0, 3, N - 1)
+    clump = rng.integers(0, clumps, N - 1)
+    r = (np.array([0.8, 1.5, 2.3])[belt] + rng.normal(0, 0.03, N - 1))*AU
+    angle = 2*np.pi*(clump + belt/3)/clumps + rng.normal(0, 0.05, N - 1)
+    s = np.stack([r*np.cos(angle), r*np.sin(angle)], axis=1)
+    m = np.minimum(10**22*(1 - rng.uniform(0, 1, N - 1))**(-1/0.8), 10**27)   # Pareto tail: many small, a few large
+    return build(star(M, avg_density=2000), bodies(m, s, circular_velocity(s, M), 2000, PALETTE[0]))
+
+# A dense, star-less swarm with random velocities, so many bodies collide every step
+def collision_swarm(N, seed, spacing=8*10**8, speed=2*10**4):
+    rng = np.random.default_rng(seed)
+    r = np.sqrt(rng.uniform(0, 1, N))*spacing*np.sqrt(N)
+    angle = rng.uniform(0, 2*np.pi, N)
+    s = np.stack([r*np.cos(angle), r*np.sin(angle)], axis=1)
+    return build(bodies(10**rng.uniform(24, 26, N), s, rng.normal(0, speed, (N, 2)), 500, PALETTE[0]))
+
+WORKLOADS = {'disk': uniform_disk, 'belts': clustered_belts, 'swarm': collision_swarm}
+
+
+def summary(times):
+    times = np.asarray(times)
+    return {'mean': float(times.mean()), 'min': float(times.min()), 'max': float(times.max())}
+
+def state_bytes(model):
+    state = getattr(model, 'state', None)
+    if state is None: return None
+    return int(sum(getattr(state, name).nbytes for name in state.vectors + state.scalars + ('locale', 'ids', 'group')))
+
+# Times one engine on one system: 'repeats' steps stage by stage, then 'repeats' full steps, then one step
+# under tracemalloc for the peak memory it allocates. Sizes above MAX_BODIES[engine] are skipped.
+def run_case(workload, N, engine, repeats=3, seed=0):
+    row = {'workload': workload, 'bodies': N, 'engine': engine}
+    if N > MAX_BODIES[engine]: return dict(row, skipped=f"above MAX_BODIES[{engine!r}] = {MAX_BODIES[engine]}")
+    cls, settings = ENGINES[engine]
+    start = time.perf_counter()
+    config = Config(input=WORKLOADS[workload](N, seed), **settings)
+    model = cls(config)
+    row['build_seconds'] = time.perf_counter() - start
+    try:
+        model.step()                                    # Warm up (binds the state, starts worker pools)
+        stage_times = {stage: [] for stage in model.stages}
+        merged = escaped = 0
+        for _ in range(repeats):
+            for stage in model.stages:
+                start = time.perf_counter()
+                getattr(model, stage)()
+                stage_times[stage].append(time.perf_counter() - start)
+            merged += len(getattr(model, 'merged', []))
+            escaped += len(getattr(model, 'escaped', []))
+        step_times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model.step()
+            step_times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        model.step()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        if getattr(model, 'forces', None) is not None: model.forces.close()
+    if settings.get('WORKERS', 1) > 1:                  # The memory figures below are this process only; the forces are in the workers
+        row['worker_max_rss_bytes'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss*1024
+    step = summary(step_times)
+    return dict(row, repeats=repeats, stages={stage: summary(t) for stage, t in stage_times.items()},
+                step=step, steps_per_second=1/step['mean'] if step['mean'] else None,
+                peak_step_bytes=int(peak), state_bytes=state_bytes(model),
+                max_rss_bytes=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024,
+                bodies_after=len(model.current_system), merged=merged, escaped=escaped)
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'cpus': multiprocessing.cpu_count(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+def run(sizes=(10, 100, 1000, 10000, 100000), workloads=tuple(WORKLOADS), engines=tuple(ENGINES), repeats=3, seed=0, log=None):
+    results = []
+    for workload in workloads:
+        for N in sizes:
+            for engine in engines:
+                row = run_case(workload, N, engine, repeats, seed)
+                results.append(row)
+                if log is not None: print(line(row), file=log, flush=True)
+    return {'meta': metadata(), 'results': results}
+
+# Mean full-step time of every case run in both 'baseline' and 'current', as current/baseline ratios.
+def compare(baseline, current):
+    key = lambda row: (row['workload'], row['bodies'], row['engine'])
+    base = {key(row): row for row in baseline['results'] if 'step' in row}
+    rows = []
+    for row in current['results']:
+        if 'step' not in row or key(row) not in base: continue
+        old, new = base[key(row)]['step']['mean'], row['step']['mean']
+        rows.append({'workload': row['workload'], 'bodies': row['bodies'], 'engine': row['engine'],
+                     'baseline': old, 'current': new, 'ratio': new/old if old else None})
+    return rows
+
+def line(row):
+    name = f"{row['workload']:>6} {row['bodies']:>7} {row['engine']:>8}"
+    if 'skipped' in row: return f"{name}  skipped ({row['skipped']})"
+    slowest = max(row['stages'], key=lambda stage: row['stages'][stage]['mean'])
+    return (f"{name}  {1000*row['step']['mean']:10.2f} ms/step  peak {row['peak_step_bytes']/2**20:8.1f} MiB"
+            f"  slowest stage {slowest} ({1000*row['stages'][slowest]['mean']:.2f} ms)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the Gravitation step pipeline on synthetic systems.")
+    parser.add_argument("--sizes", default="10,100,1000,10000,100000", help="comma separated body counts")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help="comma separated, from: " + ", ".join(WORKLOADS))
+    parser.add_argument("--engines", default=",".join(ENGINES), help="comma separated, from: list (the original Gravitation, small N only), "
+                        "direct (VectorGravitation), parallel (direct sum over every CPU), tree (Barnes-Hut)")
+    parser.add_argument("--repeats", type=int, default=3, help="timed steps per case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json", help="JSON results file ('-' for stdout)")
+    parser.add_argument("--compare", help="earlier results file to compare the new results with")
+    args = parser.parse_args(argv)
+
+    split = lambda text: [x for x in text.split(",") if x]
+    for name in split(args.workloads): assert name in WORKLOADS, name
+    for name in split(args.engines): assert name in ENGINES, name
+    results = run([int(N) for N in split(args.sizes)], split(args.workloads), split(args.engines),
+                  args.repeats, args.seed, log=sys.stderr)
+    if args.output == "-": json.dump(results, sys.stdout, indent=1)
+    else:
+        with open(args.output, "w") as f: json.dump(results, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f: baseline = json.load(f)
+        for row in compare(baseline, results):
+            print(f"{row['workload']:>6} {row['bodies']:>7} {row['engine']:>8}  {1000*row['baseline']:10.2f} -> "
+                  f"{1000*row['current']:10.2f} ms/step  x{row['ratio']:.2f}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
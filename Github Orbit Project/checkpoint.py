@@ -0,0 +1,41 @@
+import json
+import numpy as np
+from mass import *
+from system_state import SystemState
+
+"""Checkpoints hold everything needed to carry on a run: every field of every Mass (including its ID),
+the Mass.id counter, the elapsed time, the current time step, the model's new_ids / rem_ids and its
+merger lineage.
+They are stored as a single compressed .npz file of arrays plus a JSON header."""
+def save_checkpoint(path, model, time_elapsed=0):
+    if hasattr(model, 'state'): model.state.absorb()
+    masses = list(model.current_system)
+    vector = lambda name: np.array([[float(x) for x in SystemState.vector_or_zero(getattr(n, name))] for n in masses]).reshape(-1, 2)
+    header = {'time_elapsed': time_elapsed, 'mass_id': Mass.id, 'dT': model.dT,
+              'new_ids': [int(i) for i in model.new_ids], 'rem_ids': [int(i) for i in model.rem_ids],
+              'lineage': [[int(a), int(b)] for a, b in getattr(model, 'lineage', {}).items()]}
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, header=np.array(json.dumps(header)),
+                            ID=np.array([n.ID for n in masses], dtype=np.int64),
+                            group=np.array([n.group for n in masses], dtype=np.int64),
+                            m=np.array([float(n.m) for n in masses]),
+                            avg_density=np.array([float(n.avg_density) for n in masses]),
+                            s=vector('s'), v=vector('v'), p=vector('p'), gR=vector('gR'),
+                            colour=np.array([n.colour for n in masses], dtype=np.int64).reshape(-1, 3),
+                            locale=np.array([n.locale if n.locale is not None else [0, 0] for n in masses], dtype=np.int64).reshape(-1, 2),
+                            has_locale=np.array([n.locale is not None for n in masses]))
+
+# Lays the bodies of a checkpoint out in a SystemState (with their saved IDs, so the Mass.id counter carries on
+# exactly where it stopped), runs them in engine(main) and returns (model, time_elapsed).
+def load_checkpoint(path, main, engine):
+    with np.load(path) as data:
+        header = json.loads(str(data['header']))
+        locale = np.where(data['has_locale'][:,None], data['locale'], SystemState.NO_LOCALE)
+        state = SystemState.from_arrays(data['m'], data['s'], data['v'], data['avg_density'], data['colour'],
+                                        ID=data['ID'], group=data['group'], p=data['p'], gR=data['gR'], locale=locale)
+    Mass.id = header['mass_id']
+    main.input = state.masses
+    model = engine(main)
+    model.dT, model.new_ids, model.rem_ids = header['dT'], header['new_ids'], header['rem_ids']
+    if hasattr(model, 'lineage'): model.lineage = {a: b for a, b in header.get('lineage', [])}
+    return model, header['time_elapsed']
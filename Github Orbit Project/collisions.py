@@ -0,0 +1,60 @@
+import numpy as np
+from quadtree import QuadTree
+
+"""SpatialHash is the broad phase of collision detection. Every body covers the grid cells overlapped by
+a square of half-width 'reach' around it, where reach bounds how close another body has to be before
+the narrow phase could report contact. Only bodies sharing a cell are returned as candidate pairs,
+so the cost grows with the number of bodies rather than the number of pairs."""
+class SpatialHash:
+    max_cells_across = 16                               # Largest reach may span at most this many cells each way
+    def __init__(self, s, reach):
+        self.s, self.reach = s, reach
+        self.N = len(reach)
+        if self.N: self.cell = max(2*float(np.median(reach)), float(reach.max())/self.max_cells_across, 1.0)
+
+    # Returns index arrays (i, j), i < j, of every distinct pair of bodies sharing at least one cell.
+    def pairs(self):
+        none = np.zeros(0, dtype=np.int64)
+        if self.N < 2: return none, none
+        lower = np.floor((self.s - self.reach[:,None])/self.cell).astype(np.int64)
+        upper = np.floor((self.s + self.reach[:,None])/self.cell).astype(np.int64)
+        span = upper - lower + 1
+        counts = span[:,0]*span[:,1]
+        bodies = np.repeat(np.arange(self.N), counts)
+        offset = QuadTree.ranges(counts)
+        cx = np.repeat(lower[:,0], counts) + offset % np.repeat(span[:,0], counts)
+        cy = np.repeat(lower[:,1], counts) + offset // np.repeat(span[:,0], counts)
+        order = np.lexsort((bodies, cy, cx))
+        bodies, cx, cy = bodies[order], cx[order], cy[order]
+        new_cell = np.concatenate([[True], (cx[1:] != cx[:-1]) | (cy[1:] != cy[:-1])])
+        end = np.append(np.flatnonzero(new_cell)[1:], len(bodies))[np.cumsum(new_cell) - 1]
+        later = end - np.arange(len(bodies)) - 1        # Entries after this one in the same cell
+        first = np.repeat(np.arange(len(bodies)), later)
+        second = first + 1 + QuadTree.ranges(later)
+        i, j = bodies[first], bodies[second]
+        key = np.unique(np.minimum(i, j)*self.N + np.maximum(i, j))
+        return key // self.N, key % self.N
+
+
+"""UnionFind groups bodies connected by contact pairs, so chains such as A touching B touching C
+end up in a single cluster however the pairs were found."""
+class UnionFind:
+    def __init__(self):
+        self.parent, self.size = {}, {}
+    def find(self, a):
+        self.parent.setdefault(a, a)
+        self.size.setdefault(a, 1)
+        while self.parent[a] != a:
+            self.parent[a] = self.parent[self.parent[a]]
+            a = self.parent[a]
+        return a
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b: return
+        if self.size[a] < self.size[b]: a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+    def groups(self):
+        out = {}
+        for a in self.parent: out.setdefault(self.find(a), []).append(a)
+        return list(out.values())
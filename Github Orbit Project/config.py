@@ -0,0 +1,23 @@
+"""Config holds every setting Gravitation reads from its 'main' object (normally the Main instance),
+so the physics can be run without Main, a display or pygame."""
+class Config:
+    AU, G = 1.496*10**11, 6.67430*10**-11           # Average distance between Sun and Earth # Newton's Gravitational Constant
+    SCREEN_SCALE = 3                                # Number of AU either side of the origin that are simulated
+    TIME_LAPSE = 1
+    SOLVER, THETA = "direct", 0.5                   # "direct" sums every pair, "tree" uses Barnes-Hut with opening angle THETA
+    WORKERS = 1                                     # Processes sharing the direct-sum force calculation
+    INTEGRATOR = "euler"                            # "euler", "leapfrog" or "rk4", see integrators.py
+    ADAPTIVE, ETA, MIN_TIME_STEP = False, 0.1, 1    # Adaptive time step: fraction of the closest encounter time, shortest step (s)
+    CHECKPOINT = None                               # File the interactive run is restored from at start and saved to on exit
+    SCENARIO = None                                 # Scenario file (see scenarios.py) the interactive run starts from instead of the solar system
+    PHYSICS_THREAD = True                           # Interactive run: step the physics in a background thread, see physics_thread.py
+    STEPS_PER_SECOND, FPS = 240, 60                 # Physics steps per second (0 = as fast as possible) # Frame rate limit
+    PROFILE = False                                 # Time every step stage (and Main's drawing / events), see profiling.py
+    screen_width, screen_height = 700, 700
+    def __init__(self, input=[], center_object_ID=None, **settings):
+        self.input = input
+        self.center_object_ID = center_object_ID
+        if len(self.input) == 0: self.center_object_ID = None
+        for name in settings:
+            assert hasattr(Config, name), name
+            setattr(self, name, settings[name])
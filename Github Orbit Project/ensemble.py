@@ -0,0 +1,194 @@
+import itertools
+import multiprocessing
+import random
+from vector_gravity import *
+from systems import *
+from config import *
+from orbits import *
+
+"""BatchedGravitation advances several independent systems in one vectorized step. Every Mass carries
+the group (ensemble member) it belongs to, and the direct sum runs over a list of same-group pairs, so
+the work is the sum of each member's N^2 rather than (total N)^2. Collisions are only looked for within
+a group, and the gravity suspended during a collision is only that of the group where it happened."""
+class BatchedGravitation(VectorGravitation):
+    pairs_version, pairs = None, None
+    # Index arrays (i, j) of every ordered pair of distinct masses in the same group, rebuilt only when
+    # bodies have been added or removed since the last call.
+    def group_pairs(self):
+        if self.pairs_version != self.state.version:
+            self.pairs, self.pairs_version = self.build_group_pairs(), self.state.version
+        return self.pairs
+
+    def build_group_pairs(self):
+        group = self.state.group
+        order = np.argsort(group, kind='stable')
+        start = np.searchsorted(group[order], group[order], side='left')
+        count = np.searchsorted(group[order], group[order], side='right') - start
+        i = np.repeat(order, count)
+        j = order[np.repeat(start, count) + QuadTree.ranges(count)]
+        return i[i != j], j[i != j]
+
+    # 2.
+    def get_neighbours(self):
+        self.others = None
+        self.i, self.j = self.group_pairs()
+
+    # 3.
+    def r_vectors(self):
+        self.tree = None
+        self.r = self.state.s[self.j] - self.state.s[self.i]
+
+    # 4.
+    def R_mag(self):
+        self.r_mag = np.sqrt(self.r[:,0]**2 + self.r[:,1]**2)
+
+    # 5. One row per pair.
+    def g_vectors(self):
+        D, i, j = self.state.real_diameter, self.i, self.j
+        self.g, apart = pair_g(self.r, self.r_mag, D[i], D[j], self.state.m[j], self.main.G)
+        self.g[touching(i, j, apart, len(self.state))[i]] = 0
+
+    # 6.
+    def resultant_g(self):
+        N = len(self.state)
+        self.state.gR[:,0] = np.bincount(self.i, weights=self.g[:,0], minlength=N)
+        self.state.gR[:,1] = np.bincount(self.i, weights=self.g[:,1], minlength=N)
+
+    def interactions(self):
+        return len(self.i)
+
+    def near_pairs(self, reach):
+        i, j = super().near_pairs(reach)
+        same = self.state.group[i] == self.state.group[j]
+        return i[same], j[same]
+
+    def affected(self, colliding):
+        return np.isin(self.state.group, self.state.group[colliding])
+
+    def accelerations(self, s):
+        state, (i, j) = self.state, self.group_pairs()
+        r = s[j] - s[i]
+        d = np.sqrt(r[:,0]**2 + r[:,1]**2)
+        g, apart = pair_g(r, d, state.real_diameter[i], state.real_diameter[j], state.m[j], self.main.G)
+        g = np.stack([np.bincount(i, weights=g[:,k], minlength=len(state)) for k in range(2)], axis=1)
+        g[touching(i, j, apart, len(state))] = 0
+        return g
+
+
+"""Ensemble runs many variants of one starting system and summarises how each one turned out.
+A member is a dict of variations on the base system:
+    seed        seeds the random choices below
+    spawn       number of extra masses, picked from mass_range as in Main.event_loop, on near-circular orbits
+    mass_range  [min, max] mass of spawned masses
+    perturb     standard deviation of the random change to every velocity, as a fraction of its size
+and any Config setting (e.g. TIME_LAPSE) to override for that member. Members are split over a pool
+of processes; members with the same settings are advanced together by a BatchedGravitation when the
+settings allow it (direct solver, one worker, fixed time step). Pool processes can't start worker pools of
+their own, so when members run in a pool (processes != 1) every member runs with WORKERS = 1."""
+class Ensemble:
+    def __init__(self, system="solar", steps=1000, processes=None, batch_size=16, **settings):
+        self.system, self.steps = system, steps
+        self.processes, self.batch_size = processes, batch_size
+        self.settings = settings                        # Config settings shared by every member
+
+    # Every combination of the given parameter values, once per seed.
+    @staticmethod
+    def grid(seeds=(0,), **params):
+        names = list(params)
+        return [dict(zip(names, values), seed=seed)
+                for values in itertools.product(*params.values()) for seed in seeds]
+
+    # Returns one outcome dict per member, in the order given.
+    def run(self, members):
+        pooled = self.processes != 1
+        tasks = [(self.system, self.steps, self.settings, batch, pooled) for batch in self.batches(members)]
+        if not pooled:
+            results = [run_batch(task) for task in tasks]
+        else:
+            with multiprocessing.Pool(self.processes) as pool: results = pool.map(run_batch, tasks)
+        outcomes = [None]*len(members)
+        for batch in results:
+            for ind, outcome in batch: outcomes[ind] = outcome
+        return outcomes
+
+    def batches(self, members):
+        same_settings = {}
+        for ind, member in enumerate(members):
+            overrides = tuple(sorted((k, v) for k, v in member.items() if hasattr(Config, k)))
+            same_settings.setdefault(overrides, []).append((ind, member))
+        out = []
+        for overrides, group in same_settings.items():
+            settings = dict(self.settings, **dict(overrides))
+            size = self.batch_size if batchable(settings) else 1
+            out += [group[k:k + size] for k in range(0, len(group), size)]
+        return out
+
+
+def batchable(settings):
+    config = Config(**settings)
+    return config.SOLVER == "direct" and config.WORKERS == 1 and not config.ADAPTIVE
+
+
+# Builds the starting masses of one member.
+def build_member(system, member, config):
+    rnd = random.Random(member.get('seed', 0))
+    masses = SYSTEMS[system]()
+    perturb = member.get('perturb', 0)
+    for n in masses:
+        n.v = [x*(1 + perturb*rnd.gauss(0, 1)) for x in n.v]
+    primary = max(masses, key=lambda n: n.m) if masses else None
+    min_mass, max_mass = member.get('mass_range', [10**27, 10**29])
+    for _ in range(member.get('spawn', 0)):
+        r, angle = rnd.uniform(0.2, 0.9)*config.SCREEN_SCALE*config.AU, rnd.uniform(0, 2*math.pi)
+        s = [r*math.cos(angle), r*math.sin(angle)]
+        speed = (config.G*primary.m/r)**0.5*(1 + perturb*rnd.gauss(0, 1)) if primary else 0
+        v = [-speed*math.sin(angle), speed*math.cos(angle)]
+        if primary: s, v = [s[0] + primary.s[0], s[1] + primary.s[1]], [v[0] + primary.v[0], v[1] + primary.v[1]]
+        masses.append(Mass(m=rnd.randrange(min_mass, max_mass), s=s, v=v,
+                           colour=rnd.choice([(250,255,255), (200,240,255)]), avg_density=2000))
+    return masses
+
+
+# Runs one batch of (index, member) pairs in this process and returns (index, outcome) pairs.
+# In a pool process (pooled) the direct sum is not split over further processes.
+def run_batch(task):
+    system, steps, settings, batch, pooled = task
+    settings = dict(settings, **{k: v for k, v in batch[0][1].items() if hasattr(Config, k)})
+    if pooled: settings['WORKERS'] = 1
+    config = Config(**settings)
+    input = []
+    for group, (_, member) in enumerate(batch):
+        masses = build_member(system, member, config)
+        for n in masses: n.group = group
+        input += masses
+    config.input = input
+    model = (BatchedGravitation if len(batch) > 1 else VectorGravitation)(config)
+    outcomes = [{'member': member, 'collisions': 0, 'merged_bodies': 0, 'ejections': 0, 'ejected_IDs': []}
+                for _, member in batch]
+    time_elapsed = 0
+    try:
+        for _ in range(steps):
+            if not len(model.current_system): break
+            model.step()
+            time_elapsed += model.dT
+            for M, cluster in model.merged:
+                outcomes[M.group]['collisions'] += 1
+                outcomes[M.group]['merged_bodies'] += len(cluster)
+            for n in model.escaped:
+                outcomes[n.group]['ejections'] += 1
+                outcomes[n.group]['ejected_IDs'].append(n.ID)
+    finally:
+        if model.forces is not None: model.forces.close()
+    state = model.state
+    for group, outcome in enumerate(outcomes):
+        rows = np.flatnonzero(state.group == group)
+        outcome.update({'time': time_elapsed, 'bodies': len(rows), 'orbits': []})
+        if not len(rows): continue
+        primary = rows[np.argmax(state.m[rows])]
+        others = rows[rows != primary]
+        a, e, period = orbital_elements(state.s[others] - state.s[primary], state.v[others] - state.v[primary],
+                                        config.G*(state.m[primary] + state.m[others]))
+        outcome['primary_ID'] = int(state.ids[primary])
+        outcome['orbits'] = [{'ID': int(state.ids[k]), 'm': float(state.m[k]), 'a': float(a[ind]),
+                              'e': float(e[ind]), 'period': float(period[ind])} for ind, k in enumerate(others)]
+    return [(ind, outcome) for (ind, _), outcome in zip(batch, outcomes)]
@@ -0,0 +1,190 @@
+import argparse
+import math
+import multiprocessing
+import os
+import shlex
+import subprocess
+import sys
+import time
+from collections import deque
+import numpy as np
+import pygame
+from headless import *
+from renderer import *
+
+"""Export renders a run or a saved trajectory off-screen with the look of Main.draw, drawing ranges of frames
+in a pool of worker processes and saving them as images or piping them to a video encoder."""
+ENCODER = ("ffmpeg -y -loglevel error -f rawvideo -pix_fmt rgb24 -s {width}x{height} -r {fps} -i - "
+           "-c:v libx264 -pix_fmt yuv420p {output}")
+DEFAULT_COLOUR = (250,255,255)                          # Bodies of trajectories saved without colours
+DEFAULT_DENSITY = 1000                                  # ... and without densities (Mass's default)
+
+
+"""View maps a frame (a dict of 'time', 'ID', 'm', 's' and optionally 'avg_density' and 'colour' arrays, as
+from TrajectoryReader.frame) to what Renderer.draw takes, the way Main.draw does."""
+class View:
+    def __init__(self, size=(700, 700), SCREEN_SCALE=Config.SCREEN_SCALE, DOT_SCALE=700, center_object_ID=None,
+                 background=(0,0,0), label=False):
+        self.size, self.SCREEN_SCALE, self.DOT_SCALE = tuple(size), SCREEN_SCALE, DOT_SCALE
+        self.center_object_ID, self.background, self.label = center_object_ID, background, label
+        self.distance_unit = SCREEN_SCALE*Config.AU
+
+    def center(self, frame):
+        if self.center_object_ID is None: return np.zeros(2)
+        k = np.flatnonzero(np.asarray(frame['ID']) == self.center_object_ID)
+        return np.asarray(frame['s'][k[0]], dtype=float) if len(k) else np.zeros(2)
+
+    def project(self, frame):
+        W, H = self.size
+        s = np.asarray(frame['s'], dtype=float) - self.center(frame)
+        m = np.asarray(frame['m'], dtype=float)
+        points = np.empty((len(s), 2))
+        points[:,0] = 0.5*W*s[:,0]/self.distance_unit + 0.5*W
+        points[:,1] = -0.5*W*s[:,1]/self.distance_unit + 0.5*H
+        avg_density = frame['avg_density'] if 'avg_density' in frame else DEFAULT_DENSITY
+        D = 2*(3*m/(4*math.pi*np.asarray(avg_density, dtype=float)))**(1/3)
+        diameters = np.maximum(self.DOT_SCALE*D/self.distance_unit, 1)
+        colours = (frame['colour'] if 'colour' in frame else np.broadcast_to(DEFAULT_COLOUR, (len(s), 3))).tolist()
+        return points, diameters, colours
+
+
+# A frame dict of a running Headless model; 'colours' holds (state version, colour rows), rebuilt when the bodies change.
+def capture(run, colours):
+    state = run.model.state
+    state.absorb()
+    if colours[0] != state.version:
+        colours[:] = state.version, np.array([n.colour for n in state.masses], dtype=np.uint8).reshape(-1, 3)
+    return {'time': run.time_elapsed, 'ID': state.ids.copy(), 'm': state.m.copy(), 's': state.s.copy(),
+            'avg_density': state.avg_density.copy(), 'colour': colours[1]}
+
+# Jobs are (number of the first frame, frames): frames are either a list of frame dicts or
+# ('trajectory', path, frame indices), in which case the worker reads them itself.
+def trajectory_jobs(path, start=0, stop=None, every=1, chunk=32):
+    indices = range(start, len(TrajectoryReader(path)) if stop is None else stop, every)
+    for k in range(0, len(indices), chunk):
+        yield k, ('trajectory', path, list(indices[k:k + chunk]))
+
+def run_jobs(run, steps, every=1, chunk=32):
+    colours = [None, None]
+    frames, first = [capture(run, colours)], 0
+    for ind in range(1, steps + 1):
+        run.step()
+        if ind % every == 0: frames.append(capture(run, colours))
+        if len(frames) == chunk:
+            yield first, frames
+            first, frames = first + chunk, []
+    if frames: yield first, frames
+
+
+# Worker side: one Renderer per process, kept for the sprite cache.
+worker = {}
+def start_worker(view, pattern):
+    worker.update(view=view, pattern=pattern, renderer=Renderer(view.size, view.background), readers={})
+    if view.label:
+        pygame.font.init()
+        worker['font'] = pygame.font.SysFont("Courier", 14)
+
+def frames_of(frames):
+    if isinstance(frames, list): return frames
+    _, path, indices = frames
+    if path not in worker['readers']: worker['readers'][path] = TrajectoryReader(path)
+    return [worker['readers'][path].frame(k) for k in indices]
+
+# The frame drawn as an (H, W, 3) uint8 array.
+def render(frame):
+    view, renderer = worker['view'], worker['renderer']
+    renderer.draw(None, *view.project(frame))
+    if view.label:
+        text = f"{frame['time']/(365*24*3600):.2f} calendar years"
+        renderer.frame.blit(worker['font'].render(text, True, (120,140,200)), (8, 8))
+    W, H = view.size
+    return np.frombuffer(pygame.image.tobytes(renderer.frame, 'RGB'), dtype=np.uint8).reshape(H, W, 3)
+
+# Renders one job; returns the number of frames saved (image sequence) or their buffers (to be piped).
+def render_range(job):
+    first, frames = job
+    frames, buffers = frames_of(frames), []
+    for k, frame in enumerate(frames):
+        buffer = render(frame)
+        if worker['pattern'] is None: buffers.append(buffer)
+        else: pygame.image.save(worker['renderer'].frame, worker['pattern'] % (first + k))
+    return buffers if worker['pattern'] is None else len(frames)
+
+
+# Renders every job to 'output' with 'workers' processes (1: in this process); returns the number of frames.
+def export(jobs, view, output, workers=None, fps=60, encoder=ENCODER):
+    workers = workers or multiprocessing.cpu_count()
+    pattern = output if '%' in output else None
+    encoding = None
+    if pattern is not None: os.makedirs(os.path.dirname(pattern) or '.', exist_ok=True)
+    else:
+        command = [part.format(width=view.size[0], height=view.size[1], fps=fps, output=output) for part in shlex.split(encoder)]
+        encoding = subprocess.Popen(command, stdin=subprocess.PIPE)
+    done = 0
+    def deliver(result):
+        if encoding is None: return result
+        for buffer in result: encoding.stdin.write(buffer.data)
+        return len(result)
+    try:
+        if workers == 1:
+            start_worker(view, pattern)
+            for job in jobs: done += deliver(render_range(job))
+        else:
+            with multiprocessing.Pool(workers, initializer=start_worker, initargs=(view, pattern)) as pool:
+                pending = deque()
+                for job in jobs:
+                    pending.append(pool.apply_async(render_range, (job,)))
+                    if len(pending) >= 2*workers: done += deliver(pending.popleft().get())
+                while pending: done += deliver(pending.popleft().get())
+    finally:
+        if encoding is not None:
+            encoding.stdin.close()
+            if encoding.wait() != 0: raise RuntimeError(f"encoder exited with status {encoding.returncode}")
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render a run to an image sequence or a video, off-screen and in parallel.")
+    parser.add_argument("output", help="image sequence pattern (e.g. frames/%%06d.png) or video file for the encoder")
+    parser.add_argument("--trajectory", help="trajectory directory to render (otherwise a run is driven here)")
+    parser.add_argument("--start", type=int, default=0, help="first trajectory frame")
+    parser.add_argument("--stop", type=int, default=None, help="trajectory frame to stop before")
+    parser.add_argument("--system", choices=sorted(SYSTEMS), default="solar")
+    parser.add_argument("--scenario", help="scenario file (.npz or .json, see scenarios.py) to start from instead of --system")
+    parser.add_argument("--restore", help="checkpoint file to carry on from")
+    parser.add_argument("--steps", type=int, default=10000, help="steps to run when driving a run")
+    parser.add_argument("--solver", choices=["direct", "tree"], default=Config.SOLVER)
+    parser.add_argument("--integrator", choices=sorted(INTEGRATORS), default=Config.INTEGRATOR)
+    parser.add_argument("--time-lapse", type=float, default=Config.TIME_LAPSE)
+    parser.add_argument("--every", type=int, default=1, help="trajectory frames / steps per rendered frame")
+    parser.add_argument("--chunk", type=int, default=32, help="frames per worker task (at most two tasks per worker are in flight)")
+    parser.add_argument("--workers", type=int, default=None, help="rendering processes (default: every CPU, 1: none)")
+    parser.add_argument("--size", type=int, nargs=2, default=(700, 700), metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--screen-scale", type=float, default=None, help="AU either side of the center (default: the scenario's, else Config's)")
+    parser.add_argument("--dot-scale", type=float, default=700, help="apparent size of the bodies, as in Main")
+    parser.add_argument("--center", type=int, default=None, help="ID of the body to keep at the center")
+    parser.add_argument("--label", action="store_true", help="draw the elapsed time in the corner")
+    parser.add_argument("--fps", type=float, default=60)
+    parser.add_argument("--encoder", default=ENCODER, help="encoder command reading raw RGB frames on stdin, with {width} "
+                                                          "{height} {fps} {output} filled in")
+    args = parser.parse_args(argv)
+
+    input, header = [], {}
+    if not args.trajectory: input, header = (load_scenario(args.scenario) if args.scenario else (SYSTEMS[args.system](), {}))
+    screen_scale = args.screen_scale or header.get('SCREEN_SCALE') or Config.SCREEN_SCALE
+    center = args.center if args.center is not None else header.get('center_object_ID')
+    if args.trajectory: jobs = trajectory_jobs(args.trajectory, args.start, args.stop, args.every, args.chunk)
+    else:
+        config = Config(input=input, center_object_ID=center, SOLVER=args.solver, INTEGRATOR=args.integrator,
+                        TIME_LAPSE=args.time_lapse, SCREEN_SCALE=screen_scale)
+        run = Headless.restore(args.restore, config) if args.restore else Headless(config)
+        jobs = run_jobs(run, args.steps, args.every, args.chunk)
+    view = View(args.size, screen_scale, args.dot_scale, center, label=args.label)
+    start = time.perf_counter()
+    frames = export(jobs, view, args.output, args.workers, args.fps, args.encoder)
+    seconds = time.perf_counter() - start
+    print(f"{frames} frames in {seconds:.2f} s ({frames/seconds if seconds else 0:.0f} frames/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 from mass import *
 from support_functions import *
+from profiling import *
 
 """Gravitation class is responsible for calculating initial data provided by each Mass() object 
 instanciated in the Main class, then updating each mass's data structures for the next calculation. """
 class Gravitation:
     time_step = 3000                                    # Default 3000 seconds per frame. Optimal upper limit for collsion handling
+    stages = ('mass_network', 'get_neighbours', 'r_vectors', 'R_mag', 'g_vectors', 'resultant_g',
+              'remove_collided', 'object_locale_data', 'combine_removed_masses', 'calc_velocity', 'reposition')
     def __init__(self,main):
         assert abs(self.time_step) <= 3000
         self.main = main
@@ -15,26 +18,38 @@ class Gravitation:
         self.dT = Gravitation.time_step*self.main.TIME_LAPSE
         self.removed, self.rem_ids, self.new_ids, self.new = [],[],[],[]
         self.mass_join_errors =0
-    
+        self.profiler = Profiler() if self.main.PROFILE else None
+
+    # Advances the system by one time step dT, running the numbered methods below in the order of Gravitation.stages
+    def step(self):
+        if self.profiler is not None: return self.profiler.step(self)
+        for stage in self.stages: getattr(self, stage)()
+
+    # The mass in the system with this ID, or None
+    def find(self, ID):
+        for n in self.current_system:
+            if n.ID == ID: return n
+        return None
+
+    # Number of (ordered) pairs of masses whose gravity was evaluated in the last step
+    def interactions(self):
+        return len(self.current_system)*(len(self.current_system) - 1)
+
+    # Distance from the origin beyond which masses leave the simulation (unless a center object is followed)
+    def domain_limit(self):
+        limit = int(self.main.AU*self.main.SCREEN_SCALE/math.sin(math.pi/4))
+        if self.main.SCREEN_SCALE < 1: limit = (1/self.main.SCREEN_SCALE)*int(self.main.AU*self.main.SCREEN_SCALE/math.sin(math.pi/4))
+        return limit
 
     # 1. Creating a method which ientidies all mass instances surrounding the current 
     # mass. A dictionary / self.map contains {mass : surrounding masses} elements.
+    # Whether a mass is inside the simulated region is decided once per mass, not once per pair.
     def mass_network(self):
-        dict = {}
-        limit = int(self.main.AU*self.main.SCREEN_SCALE/math.sin(math.pi/4))
-        if self.main.SCREEN_SCALE < 1: limit = (1/self.main.SCREEN_SCALE)*int(self.main.AU*self.main.SCREEN_SCALE/math.sin(math.pi/4))
-        for ind in range(len(self.current_system)):
-            current = self.current_system[ind]
-            if type(current) == Mass:
-                if (current.s[0]**2 + current.s[1]**2)**0.5 <= limit or self.main.center_object_ID is not None: 
-                    vals = []
-                    for n in self.current_system:
-                        if (n.s[0]**2 + n.s[1]**2)**0.5 <= limit or self.main.center_object_ID is not None:  
-                            if self.current_system[ind] != n:
-                                vals.append(n)
-                    dict[self.current_system[ind]] = tuple(vals)
-        self.map = dict
-        self.current_system = [n for n in self.map]
+        limit = self.domain_limit()
+        inside = [n for n in self.current_system if type(n) == Mass and 
+                  ((n.s[0]**2 + n.s[1]**2)**0.5 <= limit or self.main.center_object_ID is not None)]
+        self.map = {n: tuple(i for i in inside if i is not n) for n in inside}
+        self.current_system = inside
 
     # 2. The following method will itterate through this dictionary and update the 
     # Mass.others data structure, creating a 'gravitational network' of mass instances
@@ -117,6 +132,7 @@ class Gravitation:
     # 9. The following method seperates collided masses from other masses. 
     # This function only deals with vector magnitudes.
     def remove_collided(self):
+        collided = set()                                    # Same masses as self.removed, for constant time membership tests
         for n in self.current_system:
             vf_x, vf_y = 0,0
             for distance in n.r_mag:
@@ -134,7 +150,8 @@ class Gravitation:
                 if distance < LIMIT:                       # doesn't account for direction of travel for very near objects.
                     n.gR=[0,0]                              # This adjustment to the originally planned time step, solves it. 3000 is the optimal limit for collisions, but the downside is that if we zoom in such that Main.SCREEN_SCALE
                     self.removed.append(n)                  # is less than 0.2, the higher resolution reveals smaller colliding objects (e.g astroid and Earth)
-            if n in self.removed: continue                  # don't make physical contact like they appear to for Main.SCREE_SCALE >=1
+                    collided.add(n)
+            if n in collided: continue                      # don't make physical contact like they appear to for Main.SCREE_SCALE >=1
             else:                      
                 if n.ID == self.main.center_object_ID:
                     vf_x -= abs(n.v[0])
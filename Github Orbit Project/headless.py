@@ -0,0 +1,145 @@
+import argparse
+import json
+import sys
+import time
+from vector_gravity import *
+from systems import *
+from config import *
+from checkpoint import *
+from trajectory import *
+from scenarios import load_scenario
+from analytics import Analytics
+
+"""Headless runs a Gravitation model for a fixed number of steps as fast as the CPU allows, with no
+display and no pygame. Snapshots of the state can be collected or streamed every few steps, and frames
+can be written to a TrajectoryWriter as the run goes. With Config.PROFILE, the profiler's rolling
+stage timings can be appended to a CSV file every few steps, and an Analytics can follow the run."""
+class Headless:
+    # model: an engine already built (e.g. by load_checkpoint) to run instead of engine(config)
+    def __init__(self, config, engine=VectorGravitation, model=None):
+        self.config = config
+        self.model = model if model is not None else engine(self.config)
+        self.time_elapsed, self.steps_done = 0, 0
+        self.seconds = 0
+        self.writer, self.write_every = None, 1
+        self.profile_file, self.profile_every = None, 1000
+        self.analytics = None
+
+    # Carries on from a checkpoint written by save(); settings other than the bodies come from config.
+    @classmethod
+    def restore(cls, path, config, engine=VectorGravitation):
+        model, time_elapsed = load_checkpoint(path, config, engine)
+        run = cls(config, engine, model)
+        run.time_elapsed = time_elapsed
+        return run
+
+    def save(self, path):
+        save_checkpoint(path, self.model, self.time_elapsed)
+
+    def record(self, writer, every=1):
+        self.writer, self.write_every = writer, every
+
+    def analyse(self, analytics):
+        self.analytics = analytics
+
+    # file: an open text file for Profiler.write_csv (the model needs Config.PROFILE = True)
+    def profile(self, file, every=1000):
+        assert self.model.profiler is not None, "Config.PROFILE is off"
+        self.profile_file, self.profile_every = file, every
+
+    def step(self):
+        stepped = len(self.model.current_system) > 0
+        if stepped: self.model.step()
+        self.time_elapsed += self.model.dT
+        self.steps_done += 1
+        if self.analytics is not None and stepped: self.analytics.observe(self.model, self.time_elapsed)
+        if self.writer is not None and self.steps_done % self.write_every == 0:
+            self.writer.write(self.model, self.time_elapsed)
+        if self.profile_file is not None and self.steps_done % self.profile_every == 0:
+            self.model.profiler.write_csv(self.profile_file, self.steps_done)
+
+    # Yields a snapshot every 'snapshot_every' steps (and after the last one) while running 'steps' steps.
+    def stream(self, steps, snapshot_every=0):
+        start = time.perf_counter()
+        for ind in range(1, steps + 1):
+            self.step()
+            if (snapshot_every and ind % snapshot_every == 0) or ind == steps:
+                self.seconds += time.perf_counter() - start
+                yield self.snapshot()
+                start = time.perf_counter()
+        self.seconds += time.perf_counter() - start
+
+    def run(self, steps, snapshot_every=0):
+        snapshots = list(self.stream(steps, snapshot_every))
+        return {'final': snapshots[-1] if snapshots else self.snapshot(),
+                'snapshots': snapshots if snapshot_every else [],
+                'steps': self.steps_done, 'seconds': self.seconds,
+                'steps_per_second': self.steps_per_second()}
+
+    def steps_per_second(self):
+        return self.steps_done/self.seconds if self.seconds else 0.0
+
+    def snapshot(self):
+        masses = self.model.current_system
+        return {'step': self.steps_done, 'time': self.time_elapsed,
+                'ID': [n.ID for n in masses],
+                'm': [float(n.m) for n in masses],
+                's': [[float(x) for x in n.s] for n in masses],
+                'v': [[float(x) for x in n.v] for n in masses]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the orbit simulator without a display.")
+    parser.add_argument("--system", choices=sorted(SYSTEMS), default="solar")
+    parser.add_argument("--scenario", help="scenario file (.npz or .json, see scenarios.py) to start from instead of --system")
+    parser.add_argument("--steps", type=int, default=10000)
+    parser.add_argument("--snapshot-every", type=int, default=0, help="steps between streamed snapshots (0 = final state only)")
+    parser.add_argument("--solver", choices=["direct", "tree"], default=Config.SOLVER)
+    parser.add_argument("--theta", type=float, default=Config.THETA)
+    parser.add_argument("--workers", type=int, default=Config.WORKERS, help="processes for the direct-sum forces")
+    parser.add_argument("--integrator", choices=sorted(INTEGRATORS), default=Config.INTEGRATOR)
+    parser.add_argument("--adaptive", action="store_true", help="shrink the time step during close encounters")
+    parser.add_argument("--time-lapse", type=float, default=Config.TIME_LAPSE)
+    parser.add_argument("--screen-scale", type=float, default=None, help="simulated region in AU (default: the scenario's, else Config's)")
+    parser.add_argument("--center", type=int, default=None, help="ID of the body to follow; keeps every body in the simulation")
+    parser.add_argument("--restore", help="checkpoint file to carry on from")
+    parser.add_argument("--checkpoint", help="checkpoint file to save the final state to")
+    parser.add_argument("--trajectory", help="directory to write the binary trajectory to")
+    parser.add_argument("--trajectory-every", type=int, default=1, help="steps between trajectory frames")
+    parser.add_argument("--output", default="-", help="JSON lines file for the snapshots ('-' for stdout)")
+    parser.add_argument("--profile", help="CSV file to append rolling per-stage timings to")
+    parser.add_argument("--analytics", help="JSON lines file for conserved totals, orbits and events, see analytics.py")
+    parser.add_argument("--analytics-stride", type=int, default=10, help="steps between analytics samples")
+    parser.add_argument("--primary", type=int, default=None, help="ID of the body orbits are measured about (default: the most massive)")
+    parser.add_argument("--close-distance", type=float, default=0.01, help="close approach distance in AU")
+    parser.add_argument("--orbits-every", type=int, default=0, help="samples between written orbital elements (0 = never)")
+    parser.add_argument("--profile-every", type=int, default=1000, help="steps between profile rows")
+    args = parser.parse_args(argv)
+
+    input, header = (load_scenario(args.scenario) if args.scenario else (SYSTEMS[args.system](), {}))
+    screen_scale = args.screen_scale or header.get('SCREEN_SCALE') or Config.SCREEN_SCALE
+    center = args.center if args.center is not None else header.get('center_object_ID')
+    config = Config(input=input, center_object_ID=center, SOLVER=args.solver, THETA=args.theta, WORKERS=args.workers,
+                    INTEGRATOR=args.integrator, ADAPTIVE=args.adaptive, TIME_LAPSE=args.time_lapse, SCREEN_SCALE=screen_scale,
+                    PROFILE=bool(args.profile))
+    run = Headless.restore(args.restore, config) if args.restore else Headless(config)
+    if args.trajectory: run.record(TrajectoryWriter(args.trajectory), args.trajectory_every)
+    if args.profile: run.profile(open(args.profile, "a"), args.profile_every)
+    if args.analytics:
+        run.analyse(Analytics(args.analytics_stride, args.primary, args.close_distance*Config.AU,
+                              orbits_every=args.orbits_every, sink=open(args.analytics, "w")))
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        for snapshot in run.stream(args.steps, args.snapshot_every):
+            out.write(json.dumps(snapshot) + "\n")
+    finally:
+        if out is not sys.stdout: out.close()
+        if run.writer is not None: run.writer.close()
+        if run.profile_file is not None: run.profile_file.close()
+        if run.analytics is not None: run.analytics.sink.close()
+    if args.checkpoint: run.save(args.checkpoint)
+    print(f"{run.steps_done} steps in {run.seconds:.2f} s ({run.steps_per_second():.0f} steps/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import numpy as np
+
+"""Integrators advance a VectorGravitation's state by one step dT once the pipeline has found gR,
+the acceleration at the start of the step. The work is split over the two pipeline stages:
+velocity() runs as step 7. (calc_velocity) and position() as step 8. (reposition). Any further
+accelerations a scheme needs come from accelerations(s), which uses the model's selected solver and keeps
+the gravity of the rows suspended by a collision this frame (model.suspended) at zero, as in gR."""
+class Euler:
+    evaluations = 1                                     # Force evaluations per step, including the pipeline's own
+    def __init__(self, model):
+        self.model = model
+    def accelerations(self, s):
+        g = self.model.accelerations(s)
+        if self.model.suspended is not None: g[self.model.suspended] = 0
+        return g
+    def velocity(self, dT):
+        state = self.model.state
+        state.v += state.gR*dT
+    def position(self, dT):
+        state = self.model.state
+        state.s += state.v*dT
+
+
+"""Kick-drift-kick leapfrog (velocity Verlet). Symplectic, so energy errors stay bounded instead of drifting."""
+class Leapfrog(Euler):
+    evaluations = 2
+    def velocity(self, dT):
+        state = self.model.state
+        state.v += state.gR*dT/2
+    def position(self, dT):
+        state = self.model.state
+        state.s += state.v*dT
+        state.v += self.accelerations(state.s)*dT/2
+
+
+"""Classic fourth-order Runge-Kutta on positions and velocities together."""
+class RK4(Euler):
+    evaluations = 4
+    def velocity(self, dT):
+        state = self.model.state
+        s, v, accelerations = state.s.copy(), state.v.copy(), self.accelerations
+        k1_s, k1_v = v, state.gR.copy()
+        k2_s, k2_v = v + k1_v*dT/2, accelerations(s + k1_s*dT/2)
+        k3_s, k3_v = v + k2_v*dT/2, accelerations(s + k2_s*dT/2)
+        k4_s, k4_v = v + k3_v*dT, accelerations(s + k3_s*dT)
+        self.s = s + (k1_s + 2*k2_s + 2*k3_s + k4_s)*dT/6
+        state.v += (k1_v + 2*k2_v + 2*k3_v + k4_v)*dT/6
+    def position(self, dT):
+        self.model.state.s[:] = self.s
+
+
+INTEGRATORS = {"euler": Euler, "leapfrog": Leapfrog, "rk4": RK4}
@@ -1,10 +1,19 @@
 import pygame
 from pygame.locals import *
 import random 
-from gravity import *
+import numpy as np
+from vector_gravity import *
+from systems import *
+from config import *
+from checkpoint import *
+from renderer import *
+from physics_thread import *
+from scenarios import load_scenario
+import os
 
-""" Main class contains contains the gaming loop which executes all the methods above. """   
-class Main:                          
+""" Main class contains contains the gaming loop which executes all the methods above. 
+Physics settings not given here (SOLVER, INTEGRATOR, ...) are the defaults in Config. """   
+class Main(Config):                          
     AU, G = 1.496*10**11, 6.67430*10**-11           # Average distance between Sun and Earth # Newton's Gravitational Constant                                       
     SCREEN_SCALE = 3                              # Number of AU either side of screen center / origin
     TIME_LAPSE = 1
@@ -13,35 +22,26 @@ class Main:
     assert SCREEN_SCALE >= 1 
     assert DOT_SCALE >=500 and DOT_SCALE <=1000           
                                                         
-    v_Earth = 29789                          
-    v_Merc = 29789*(1/0.378)**0.5           
-    v_Ven = 29789*(1/0.72)**0.5             
-    v_Mar = 29789*(1/1.5)**0.5
-    v_Jup = 29789*(1/5.2)**0.5
-    v_Sat = 29789*(1/9.5)**0.5
-    v_Ura = 29789*(1/19)**0.5
-    v_Nep = 29789*(1/30)**0.5
     Mass.distance_unit = SCREEN_SCALE*AU     
     Mass.scale *= DOT_SCALE 
-    SOLAR_SYSTEM = [Mass(m=1.989*10**30, s=[0,0],       v=[0,0],      colour=(255,255,250), avg_density=1408),
-                    Mass(m=3.285*10**23, s=[0.378*AU,0],v=[0,v_Merc], colour=(200,180,0),   avg_density=5429),
-                    Mass(m=4.867*10**24, s=[0.72*AU,0], v=[0,v_Ven],  colour=(200,180,0),   avg_density=5243),
-                    Mass(m=5.972*10**24, s=[AU,0],      v=[0,v_Earth],colour=(70,160,255),  avg_density=5514),
-                    Mass(m=6.389*10**23, s=[-1.5*AU,0], v=[0,-v_Mar], colour=(200,100,60),  avg_density=3934),
-                    Mass(m=1.898*10**27, s=[-5.2*AU,0], v=[0,-v_Jup], colour=(200,150,100), avg_density=1326),
-                    Mass(m=5.972*10**24, s=[9.5*AU,0],  v=[0,v_Sat],  colour=(150,150,70),  avg_density=687),
-                    Mass(m=8.681*10**25, s=[19*AU,0],   v=[0,v_Ura],  colour=(0,100,150),   avg_density=1270),
-                    Mass(m=1.024*10**26, s=[30*AU,0],   v=[0,-v_Nep], colour=(0,100,255),   avg_density=1638),]
+    SOLAR_SYSTEM = solar_system()
 
     def __init__(self):  
         pygame.init()
         self.screen_width, self.screen_height = 700, 700 
         self.size = (self.screen_width, self.screen_height) 
         self.screen = pygame.display.set_mode(self.size)
-        self.lines = pygame.Surface(self.size) 
+        self.renderer = Renderer(self.size, self.SPACE_COLOUR)
+        self.intro = None
+        self.clock = pygame.time.Clock()
+        self.physics = None                             # PhysicsThread, once the simulation has started (if PHYSICS_THREAD)
+        self.profiler, self.show_profile, self.overlay = Profiler(enabled=False), True, None
         self.icon = pygame.image.load("image.png")
         self.run = True
-        self.initialise_data_structures(input=self.SOLAR_SYSTEM, center_object_ID=None)   
+        if self.SCENARIO:                               # Bodies and center object only; the display keeps SCREEN_SCALE
+            input, header = load_scenario(self.SCENARIO)
+            self.initialise_data_structures(input=input, center_object_ID=header.get('center_object_ID'))
+        else: self.initialise_data_structures(input=self.SOLAR_SYSTEM, center_object_ID=None)   
         # self.initialise_data_structures(input=self.SOLAR_SYSTEM, center_object_ID=3) 
         # self.initialise_data_structures()   
     def initialise_data_structures(self, input=[], center_object_ID=None):
@@ -59,7 +59,9 @@ class Main:
     def caption(self, years=False):
         title = f"|Time: 0.0 calendar years|"
         if years and self.started: title = f"|Time: {round(self.time_elapsed/(365*24*3600),1)} calendar years|"
-        title += " "*30
+        title += f"  |{round(self.clock.get_fps())} fps"
+        if self.physics is not None: title += f", {round(self.physics.steps_per_second())} steps/s"
+        title += "|" + " "*20
         title += "____2D Orbit Simulator____"
         pygame.display.set_caption(title)
 
@@ -70,46 +72,46 @@ class Main:
 
     def draw(self, Model_System):
         zoom_out = (1/(Mass.distance_unit)) 
-        lines = pygame.Surface(self.size) 
-        lines.fill(self.SPACE_COLOUR)
-        points, radii, colours = [],[],[]
         if not self.drawing:
-            font1 = pygame.font.SysFont("Arial", 36)
-            font2 = pygame.font.SysFont("Cambria", 25)
-            text1 = "WHEN THE SCREEN CLEARS . . ."
-            text2 = ". . . click on / touch the screen to create new masses."
-            coordinates1 = (self.text_x/5, self.text_y -25)
-            coordinates2 = (self.text_x/10, self.text_y+25)
-            text_surface1 = font1.render(text1, True, (255,0,0))
-            text_surface2 = font2.render(text2, False, (30,100,255))
-            self.screen.blit(text_surface1,coordinates1)
-            self.screen.blit(text_surface2,coordinates2)
+            if self.intro is None:
+                font1 = pygame.font.SysFont("Arial", 36)
+                font2 = pygame.font.SysFont("Cambria", 25)
+                text1 = "WHEN THE SCREEN CLEARS . . ."
+                text2 = ". . . click on / touch the screen to create new masses."
+                coordinates1 = (self.text_x/5, self.text_y -25)
+                coordinates2 = (self.text_x/10, self.text_y+25)
+                self.intro = [(font1.render(text1, True, (255,0,0)), coordinates1),
+                              (font2.render(text2, False, (30,100,255)), coordinates2)]
+            self.screen.blits(self.intro)
         else:
-            center = self.frame_of_reference(Model_System)
-            for n in Model_System.current_system:
-                assert type(n) == Mass
-                n.screen_position = pygame_array([zoom_out*(n.s[0]-center[0])],
-                                                [zoom_out*(n.s[1]-center[1])], 
-                                                self.screen_width, self.screen_height)[0]
-                points.append(n.screen_position)
-                n.individual_position = points[0]
-                radii.append(n.dot_diameter)
-                colours.append(n.colour)
+            s, dot_diameter, colours, center = self.view(Model_System)
+            points = np.empty((len(s), 2))
+            points[:,0] = 0.5*self.screen_width*zoom_out*(s[:,0]-center[0]) + 0.5*self.screen_width
+            points[:,1] = -0.5*self.screen_width*zoom_out*(s[:,1]-center[1]) + 0.5*self.screen_height
             # Rendering so objects appear to glow
-            for n in range(len(points)): pygame.draw.circle(lines,(0,0,2), points[n], 30*radii[n]) 
-            for n in range(len(points)): pygame.draw.circle(lines,(0,0,5), points[n], 10*radii[n]) 
-            for n in range(len(points)): pygame.draw.circle(lines,(0,0,30), points[n], 4*radii[n]) 
-            for n in range(len(points)): pygame.draw.circle(lines,(0,10,60), points[n], 2.5*radii[n])
-            for n in range(len(points)):
-                if radii[n]>1: pygame.draw.circle(lines,(10,40,180), points[n], 1.6*radii[n])
-            for n in range(len(points)):
-                if radii[n]>1: pygame.draw.circle(lines,(110,160,255), points[n], 1.2*radii[n]) 
-            for n in range(len(points)): pygame.draw.circle(lines,colours[n], points[n], radii[n])
-            self.screen.blit(lines, (0, 0))
+            self.renderer.draw(self.screen, points, dot_diameter, colours)
+        if self.profiler.enabled and self.show_profile: self.draw_overlay()
+
+    # Profiler timings in the top left corner, re-rendered twice a second
+    def draw_overlay(self):
+        now = pygame.time.get_ticks()
+        if self.overlay is None or now - self.overlay[0] > 500:
+            font = pygame.font.SysFont("Courier", 12)
+            self.overlay = (now, [(font.render(line, True, (0,255,120)), (5, 5 + 13*k)) for k, line in enumerate(self.profiler.report())])
+        self.screen.blits(self.overlay[1])
+
+    # Positions, dot diameters, colours and screen center to draw: the physics thread's interpolated snapshot, or the model itself
+    def view(self, Model_System):
+        if self.physics is not None: return self.physics.view(self.center_object_ID)
+        center = self.frame_of_reference(Model_System)
+        state = Model_System.state
+        state.absorb()
+        return state.s, state.dot_diameter, [n.colour for n in state.masses], center
 
     def clock_tick(self, Model):
         if not self.drawing:
             self.time_elapsed+=Model.time_step   
+        elif self.physics is not None: self.time_elapsed = self.time_started + self.physics.time_elapsed
         else: self.time_elapsed+=Model.dT
     
     # The following method will cause the screen/viewer to follow a given object trajetcory
@@ -117,19 +119,31 @@ class Main:
     def frame_of_reference(self, Model_System):
         center=[0,0]
         if self.center_object_ID is not None and len(self.input)>0:
-            if len(Model_System.new_ids) > 0:
-                index = Model_System.new_ids.index(self.center_object_ID)
-                if index < len(Model_System.current_system):
-                    center = Model_System.current_system[index].s
-            else: 
-                center = self.input[self.center_object_ID].s
+            n = Model_System.find(self.center_object_ID)
+            if n is not None: center = n.s
         return center
     
+    # Position and velocity of the center object (from the physics thread's latest snapshot once it runs), or None
+    def center_motion(self, Model_System):
+        if self.center_object_ID is None: return None
+        if self.physics is not None: return self.physics.motion(self.center_object_ID)
+        n = Model_System.find(self.center_object_ID)
+        return (n.s, n.v) if n is not None else None
+
+    def zones(self, Model_System):
+        if self.physics is not None: return self.physics.zones()
+        return [n.locale for n in Model_System.current_system]
+
+    # New masses reach a threaded model through its queue, so the render loop never waits on a step
+    def add_mass(self, Model_System, M):
+        if self.physics is not None: self.physics.add(M)
+        else: Model_System.current_system.append(M)
+
     def event_loop(self, Model_System, mass_range=[10**27, 10**30]):
-        zones = [n.locale for n in Model_System.current_system]
         for event in pygame.event.get():
             if event.type == pygame.QUIT: 
                     self.run = False
+            if event.type == KEYDOWN and event.key == K_F3: self.show_profile = not self.show_profile
             if len(self.recent_event_log) >=2:
                 self.recent_event_log = []
                 self.recent_event_times=[]
@@ -152,12 +166,12 @@ class Main:
                     s1 = translate_points_on_screen(pts=pts2, WIDTH=self.screen_width, 
                                                 HEIGHT=self.screen_height, screen_scale=Mass.distance_unit)
                     v_x_adjust, v_y_adjust = None,None
-                    if self.center_object_ID is not None:
-                        for n in Model_System.current_system:
-                            if n.ID == self.center_object_ID:
-                                s0[0], s0[1] = s0[0]+n.s[0], s0[1]+n.s[1]
-                                s1[0], s1[1] = s1[0]+n.s[0], s1[1]+n.s[1]
-                                v_x_adjust, v_y_adjust = n.v[0], n.v[1]
+                    center = self.center_motion(Model_System)
+                    if center is not None:
+                        (cx, cy), (cvx, cvy) = center
+                        s0[0], s0[1] = s0[0]+cx, s0[1]+cy
+                        s1[0], s1[1] = s1[0]+cx, s1[1]+cy
+                        v_x_adjust, v_y_adjust = cvx, cvy
                     ds_x, ds_y = s1[0]-s0[0], s1[1]-s0[1]
                     dt = abs(t1-t0)
                     if dt > 1000: # Must be greater than zero...larger number will reduce velocity magnitude
@@ -176,38 +190,42 @@ class Main:
                         M = Mass(m=m, s=s1, v=v, colour=colour, avg_density=2000)
                         self.mass_added += M.m
                         self.mouse_history = []
-                        if M.locale not in zones: Model_System.current_system.append(M) 
+                        if M.locale not in self.zones(Model_System): self.add_mass(Model_System, M)
              
 
     def update_position(self, Model_System):
-        if len(Model_System.current_system) > 0 and self.drawing:
-            Model_System.mass_network()
-            Model_System.get_neighbours()
-            Model_System.r_vectors()
-            Model_System.R_mag()
-            Model_System.g_vectors()
-            Model_System.resultant_g()
-            Model_System.remove_collided() 
-            Model_System.object_locale_data()     
-            Model_System.combine_removed_masses() 
-            Model_System.calc_velocity()
-            Model_System.reposition() 
+        if self.PHYSICS_THREAD and self.drawing:
+            if self.physics is None: self.start_physics(Model_System)
+        elif len(Model_System.current_system) > 0 and self.drawing:
+            Model_System.step()
         if self.time_elapsed >= self.countdown and self.drawing == False: self.drawing=True
 
+    def start_physics(self, Model_System):
+        self.time_started = self.time_elapsed
+        self.physics = PhysicsThread(Model_System, self.STEPS_PER_SECOND)
+        self.physics.start()
+
     # Execution
     def main(self):
         pygame.display.set_icon(self.icon)
-        Model_System = Gravitation(self) 
+        Model_System = VectorGravitation(self) 
+        if self.CHECKPOINT and os.path.exists(self.CHECKPOINT):
+            Model_System, self.time_elapsed = load_checkpoint(self.CHECKPOINT, self, VectorGravitation)
+            self.drawing = self.started = True
+        if Model_System.profiler is not None: self.profiler = Model_System.profiler
         while self.run: 
             # Display 
             self.caption(years=True)  
-            self.draw(Model_System)  
+            with self.profiler.phase('draw'): self.draw(Model_System)
             self.update_displayed_info()
             # Technical
-            self.event_loop(Model_System, mass_range=[10**27,10**29])    
-            self.frame_of_reference(Model_System)
-            self.update_position(Model_System)
+            with self.profiler.phase('events'):
+                self.event_loop(Model_System, mass_range=[10**27,10**29])    
+            with self.profiler.phase('update_position'): self.update_position(Model_System)
             self.clock_tick(Model_System)
-            pygame.display.update()
+            with self.profiler.phase('display_update'): pygame.display.update()
+            with self.profiler.phase('idle'): self.clock.tick(self.FPS)
+        if self.physics is not None: self.physics.stop()
+        if self.CHECKPOINT: save_checkpoint(self.CHECKPOINT, Model_System, self.time_elapsed)
         pygame.quit()
-Main().main()
\ No newline at end of file
+if __name__ == "__main__": Main().main()
\ No newline at end of file
@@ -1,10 +1,45 @@
 import math
 
 
-"""Instances of the the following Mass class hold all the data concerning the their whereabouts"""
+"""Field descriptors let a Mass read and write its numeric data straight through the contiguous
+arrays of the SystemState it is bound to. An unbound Mass (e.g. one just created) keeps the data itself."""
+class Field:
+    def __set_name__(self, owner, name):
+        self.name, self.private = name, '_' + name
+    def __get__(self, n, owner=None):
+        if n is None: return self
+        if n.state is None: return getattr(n, self.private)
+        return getattr(n.state, self.name)[n.index]
+    def __set__(self, n, value):
+        if n.state is None: setattr(n, self.private, value)
+        else: getattr(n.state, self.name)[n.index] = value
+
+
+"""Locale is stored in SystemState.locale as a pair of ints, with SystemState.NO_LOCALE standing in for None."""
+class LocaleField(Field):
+    def __get__(self, n, owner=None):
+        if n is None: return self
+        if n.state is None: return n._locale
+        row = n.state.locale[n.index]
+        return None if row[0] == n.state.NO_LOCALE else row.tolist()
+    def __set__(self, n, value):
+        if n.state is None: n._locale = value
+        else: n.state.locale[n.index] = [n.state.NO_LOCALE]*2 if value is None else value
+
+
+"""Instances of the the following Mass class hold all the data concerning the their whereabouts.
+Masses have no __dict__: the attributes below are the only ones, and a bound mass keeps nothing but its
+ID, colour, group and row index, the numbers being in the SystemState arrays."""
 class Mass:
+    __slots__ = ('state', 'index', 'ID', 'colour', 'group', 'others', 'v_mag', 'r', 'r_mag', 'g', 'screen_position',
+                 '_m', '_avg_density', '_real_diameter', '_dot_diameter', '_s', '_v', '_p', '_gR', '_individual_position', '_locale')
     id, distance_unit, scale = 0, 1, 1                           
+    m, avg_density, real_diameter, dot_diameter = Field(), Field(), Field(), Field()
+    s, v, p, gR, individual_position = Field(), Field(), Field(), Field(), Field()
+    locale = LocaleField()
     def __init__(self,m=0,s=[0,0],v=[0,0], colour=(255,255,255), avg_density=1000):
+        self.state, self.index = None, None #               SystemState arrays this mass is a view into
+        self.group = 0 #                                    Independent system the mass belongs to (see ensemble.py)
         self.ID = Mass.id   
         Mass.id += 1
         self.assertions(m,v)
@@ -12,13 +47,22 @@ class Mass:
         self.m, self.avg_density, self.s, self.v = m,avg_density,s,v
         self.initialise_data_structures()   
     def initialise_data_structures(self):
-        self.others, self.v_mag, self.r = [],[],[]
+        self.others, self.v_mag, self.r = (),(),() #         Gravitation (list engine) assigns its own lists before use
         self.p = []
-        self.r_mag, self.g, self.gR = [],[],[]
+        self.r_mag, self.g, self.gR = (),(),[]
         self.locale = None #                                Base 10 log scale of position vector elements
         self.individual_position = None #                   Astronomical locations of objects on screen
         self.screen_position = None
         self.dot_diameter, self.real_diameter = self.calc_sphere_diam() 
+
+    # A mass bound to an existing row of 'state', made without copying any data (see SystemState.from_arrays).
+    @classmethod
+    def bound(cls, state, index, ID, colour, group=0):
+        n = cls.__new__(cls)
+        n.state, n.index, n.ID, n.colour, n.group = state, index, ID, colour, group
+        n.others = n.v_mag = n.r = n.r_mag = n.g = ()
+        n.screen_position = None
+        return n
     
     def assertions(self,m,v):
         assert m >= 10**22                     # Minimum mass needs to be 10**22, else mass collision methods won't work reliably
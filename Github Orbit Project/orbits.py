@@ -0,0 +1,14 @@
+import numpy as np
+
+"""Two-body orbital elements of bodies relative to a primary, for whole arrays of bodies at once.
+s and v are positions and velocities relative to the primary, mu = G*(M_primary + m)."""
+def orbital_elements(s, v, mu):
+    r = np.sqrt(s[:,0]**2 + s[:,1]**2)
+    v2 = v[:,0]**2 + v[:,1]**2
+    h = s[:,0]*v[:,1] - s[:,1]*v[:,0]                   # Specific angular momentum (z component)
+    energy = v2/2 - mu/r
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = -mu/(2*energy)                              # Negative for unbound (hyperbolic) bodies
+        e = np.sqrt(np.maximum(0, 1 + 2*energy*h**2/mu**2))
+        period = np.where(a > 0, 2*np.pi*np.sqrt(np.abs(a)**3/mu), np.inf)
+    return a, e, period
@@ -0,0 +1,29 @@
+import numpy as np
+
+"""The pairwise gravity rules of Gravitation.g_vectors, shared by every vectorized force calculation
+(VectorGravitation, BatchedGravitation, ParallelForces tiles, direct_accelerations and the leaves of QuadTree):
+    - a pair closer than the sum of their diameters (in contact) contributes no g
+    - each component of the g of a pair is rounded to 10 decimal places before the g are added up
+    - a mass in contact with a mass further along the list (a higher row) loses all of its g for the frame
+Only the leaves of a QuadTree are summed pair by pair: the g of a far node acting as one point mass is not
+rounded, and contacts are only found between bodies summed pair by pair (touching bodies always are, unless a
+far node smaller than their separation holds more than one body)."""
+
+# g on mass i due to mass j for arrays of pairs (any matching shapes), and whether each pair is apart.
+# r: vectors from i to j (..., 2), d: their lengths, D_i / D_j: diameters, m_j: masses of j.
+def pair_g(r, d, D_i, D_j, m_j, G):
+    apart = d > D_i + D_j
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inv_cube = np.where(apart, 1/d**3, 0)
+    return np.round(G*m_j[...,None]*r*inv_cube[...,None], 10), apart
+
+# Rows i in contact with a row j > i, for pairs given as row indices i, j and whether each pair is apart.
+def touching(i, j, apart, N):
+    rows = np.zeros(N, dtype=bool)
+    rows[i[~apart & (i < j)]] = True
+    return rows
+
+# The same for a block of rows r0..r1 against columns c0..c1, with apart of shape (r1 - r0, c1 - c0).
+def touching_block(r0, r1, c0, c1, apart):
+    later = np.arange(c0, c1)[None,:] > np.arange(r0, r1)[:,None]
+    return (~apart & later).any(axis=1)
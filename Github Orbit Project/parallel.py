@@ -0,0 +1,100 @@
+import multiprocessing
+import time
+import weakref
+from multiprocessing import shared_memory
+import numpy as np
+from pairwise import *
+
+"""ParallelForces splits the direct-sum force calculation over a pool of worker processes.
+Positions, masses and diameters are copied once per evaluation into shared memory that every worker
+has mapped, so no body data is pickled. Each task is one tile (a block of rows by a block of columns)
+of the N x N interaction matrix; the worker returns the partial g sums of its rows and which of them touch
+a later body, and the parent adds the partial sums of every tile into the final accelerations and zeroes
+the touching rows."""
+class ParallelForces:
+    tile = 512                                          # Rows / columns per tile of the interaction matrix
+    def __init__(self, workers, capacity=1024):
+        self.workers, self.capacity = workers, 0
+        self.pool, self.blocks = None, []
+        self.finalizer = None
+        self.allocate(capacity)
+
+    # (Re)creates the shared arrays for at least 'capacity' bodies and a pool of workers attached to them.
+    def allocate(self, capacity):
+        self.close()
+        self.capacity = capacity
+        self.blocks = [shared_memory.SharedMemory(create=True, size=capacity*8*k) for k in (2, 1, 1)]
+        self.s, self.m, self.D = [np.ndarray(shape, dtype=float, buffer=b.buf) for shape, b in
+                                  zip(((capacity, 2), (capacity,), (capacity,)), self.blocks)]
+        self.pool = multiprocessing.Pool(self.workers, initializer=attach, initargs=([b.name for b in self.blocks], capacity))
+        self.finalizer = weakref.finalize(self, release, self.pool, self.blocks)
+
+    def accelerations(self, s, m, real_diameter, G):
+        N = len(m)
+        if N > self.capacity: self.allocate(max(N, 2*self.capacity))
+        self.s[:N], self.m[:N], self.D[:N] = s, m, real_diameter
+        tiles = [(r, min(r + self.tile, N), c, min(c + self.tile, N), G)
+                 for r in range(0, N, self.tile) for c in range(0, N, self.tile)]
+        g, touched = np.zeros((N, 2)), np.zeros(N, dtype=bool)
+        for (r0, r1, c0, c1, _), (partial, touching) in zip(tiles, self.pool.imap(tile_forces, tiles)):
+            g[r0:r1] += partial
+            touched[r0:r1] |= touching
+        g[touched] = 0
+        return g
+
+    def close(self):
+        self.s = self.m = self.D = None
+        if self.finalizer is not None: self.finalizer()
+        self.pool, self.blocks, self.finalizer = None, [], None
+
+
+def release(pool, blocks):
+    pool.terminate()
+    pool.join()
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+
+# Worker side: the shared arrays are mapped once when each worker starts.
+shared = {}
+def attach(names, capacity):
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    shared['blocks'] = blocks
+    shared['s'], shared['m'], shared['D'] = [np.ndarray(shape, dtype=float, buffer=b.buf) for shape, b in
+                                             zip(((capacity, 2), (capacity,), (capacity,)), blocks)]
+
+# g on bodies r0..r1 due to bodies c0..c1, and which of the rows touch a later body.
+def tile_forces(task):
+    r0, r1, c0, c1, G = task
+    s, m, D = shared['s'], shared['m'], shared['D']
+    r = s[None,c0:c1,:] - s[r0:r1,None,:]
+    d = np.sqrt(r[...,0]**2 + r[...,1]**2)
+    g, apart = pair_g(r, d, D[r0:r1,None], D[None,c0:c1], m[None,c0:c1], G)
+    return g.sum(axis=1), touching_block(r0, r1, c0, c1, apart)
+
+
+# Times one force evaluation of the same N-body scenario with 1, 2, .. up to max_workers processes.
+def benchmark(N=8000, max_workers=None, repeats=3, seed=0):
+    rng = np.random.default_rng(seed)
+    radius, angle = rng.uniform(0.3, 3, N)*1.496*10**11, rng.uniform(0, 2*np.pi, N)
+    s = np.stack([radius*np.cos(angle), radius*np.sin(angle)], axis=1)
+    m, D = rng.uniform(10**22, 10**26, N), np.full(N, 10**6)
+    results, base = [], None
+    for workers in range(1, (max_workers or multiprocessing.cpu_count()) + 1):
+        forces = ParallelForces(workers, N)
+        forces.accelerations(s, m, D, 6.67430*10**-11)        # Warm up the pool
+        start = time.perf_counter()
+        for _ in range(repeats): forces.accelerations(s, m, D, 6.67430*10**-11)
+        seconds = (time.perf_counter() - start)/repeats
+        forces.close()
+        base = base or seconds
+        results.append({'workers': workers, 'bodies': N, 'seconds': seconds, 'speedup': base/seconds})
+    return results
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    for row in benchmark(max_workers=max_workers): print(json.dumps(row))
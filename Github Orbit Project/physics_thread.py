@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+
+"""PhysicsThread advances a model at a fixed number of steps per second (or as fast as it can with
+steps_per_second = 0), independently of the frame rate. After every step it publishes a copy of the
+positions as a snapshot. The last two snapshots are kept as a (previous, latest) pair that is swapped
+in one assignment, so the render loop never sees a half-written state. view() interpolates between the
+two, one step interval behind real time, so motion looks smooth whatever the two rates are.
+The render loop never takes 'lock': masses it adds go through add() and join the model before the next step."""
+class PhysicsThread(threading.Thread):
+    def __init__(self, model, steps_per_second=240):
+        super().__init__(daemon=True)
+        self.model, self.rate = model, steps_per_second
+        self.lock = threading.Lock()
+        self.running = True
+        self.time_elapsed, self.steps_done = 0, 0
+        self.step_times = deque(maxlen=256)             # Wall-clock time of recent steps, for steps_per_second()
+        self.pending = deque()                          # Masses added from outside, waiting for the next step
+        self.snapshots = (None, self.capture())
+
+    def run(self):
+        next_step = time.perf_counter()
+        while self.running:
+            if self.rate:
+                now = time.perf_counter()
+                if now < next_step:
+                    time.sleep(min(next_step - now, 0.002))
+                    continue
+                next_step = max(next_step + 1/self.rate, now - 0.1)   # Don't try to catch up more than 0.1 s
+            with self.lock:
+                while self.pending: self.model.current_system.append(self.pending.popleft())
+                if len(self.model.current_system): self.model.step()
+                self.time_elapsed += self.model.dT
+                self.steps_done += 1
+                snapshot = self.capture()
+            self.snapshots = (self.snapshots[1], snapshot)
+            self.step_times.append(snapshot['wall'])
+            if not self.rate: time.sleep(0)                 # Let the render loop have the interpreter
+
+    def stop(self):
+        self.running = False
+        if self.is_alive(): self.join()
+
+    # Queues a mass to join the model before the next step
+    def add(self, n):
+        self.pending.append(n)
+
+    def capture(self):
+        state = self.model.state
+        return {'wall': time.perf_counter(), 'time': self.time_elapsed, 'ID': state.ids.copy(), 's': state.s.copy(),
+                'v': state.v.copy(), 'locale': state.locale.copy(), 'dot_diameter': state.dot_diameter.copy(),
+                'colours': [n.colour for n in state.masses]}
+
+    # Position and velocity of the body ID in the latest snapshot, or None
+    def motion(self, ID):
+        latest = self.snapshots[1]
+        ind = np.flatnonzero(latest['ID'] == ID)
+        return (latest['s'][ind[0]], latest['v'][ind[0]]) if len(ind) else None
+
+    # Mass.locale of every body in the latest snapshot
+    def zones(self):
+        locale = self.snapshots[1]['locale']
+        return [None if row[0] == self.model.state.NO_LOCALE else row for row in locale.tolist()]
+
+    # Positions, dot diameters and colours to draw, and the position of the body center_ID (or the origin).
+    def view(self, center_ID=None):
+        previous, latest = self.snapshots
+        s = latest['s']
+        if previous is not None and self.rate and np.array_equal(previous['ID'], latest['ID']):
+            span = latest['wall'] - previous['wall']
+            alpha = (time.perf_counter() - 1/self.rate - previous['wall'])/span if span > 0 else 1
+            s = previous['s'] + min(max(alpha, 0), 1)*(latest['s'] - previous['s'])
+        center = [0,0]
+        if center_ID is not None:
+            ind = np.flatnonzero(latest['ID'] == center_ID)
+            if len(ind): center = s[ind[0]]
+        return s, latest['dot_diameter'], latest['colours'], center
+
+    def steps_per_second(self):
+        times = self.step_times
+        if len(times) < 2 or times[-1] == times[0]: return 0.0
+        return (len(times) - 1)/(times[-1] - times[0])
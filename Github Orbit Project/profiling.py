@@ -0,0 +1,78 @@
+import contextlib
+import threading
+import time
+from collections import deque
+import numpy as np
+
+"""Profiler keeps the durations of the last 'window' runs of every step stage (mass_network ...
+reposition), of the whole step and of any other named phase (e.g. Main's draw and event handling), plus
+per-step counts: bodies, pairs of bodies whose gravity was evaluated and bodies that collided.
+stats() gives rolling p50 / p99 / mean / max of each, and write_csv() appends them to a CSV file.
+A model with no profiler (Config.PROFILE = False, the default) runs its stages exactly as before, and
+Profiler.phase() of a disabled profiler is a shared no-op context, so instrumentation left in place costs
+next to nothing when it is off. The physics thread and the render loop may record at the same time."""
+class Profiler:
+    counts = ('bodies', 'pairs', 'collided')
+    def __init__(self, window=300, enabled=True):
+        self.window, self.enabled = window, enabled
+        self.samples = {}                               # name: deque of the last 'window' durations (s) or counts
+        self.lock = threading.Lock()
+        self.steps = 0
+
+    def add(self, name, value):
+        with self.lock:
+            if name not in self.samples: self.samples[name] = deque(maxlen=self.window)
+            self.samples[name].append(value)
+
+    # Runs one step of 'model', timing each stage.
+    def step(self, model):
+        start = stage_start = time.perf_counter()
+        for stage in model.stages:
+            getattr(model, stage)()
+            end = time.perf_counter()
+            self.add(stage, end - stage_start)
+            stage_start = end
+        self.add('step', stage_start - start)
+        self.add('bodies', len(model.current_system))
+        self.add('pairs', model.interactions())
+        self.add('collided', len(model.rem_ids))
+        self.steps += 1
+
+    def phase(self, name):
+        return Phase(self, name) if self.enabled else NO_PHASE
+
+    # {name: {'p50', 'p99', 'mean', 'max', 'last', 'n'}}; durations in seconds.
+    def stats(self):
+        with self.lock:
+            samples = {name: np.array(values, dtype=float) for name, values in self.samples.items() if len(values)}
+        return {name: {'p50': float(np.percentile(x, 50)), 'p99': float(np.percentile(x, 99)), 'mean': float(x.mean()),
+                       'max': float(x.max()), 'last': float(x[-1]), 'n': len(x)} for name, x in samples.items()}
+
+    # Text lines for an overlay or a log: timings in ms, slowest p99 first, then the counts.
+    def report(self):
+        stats = self.stats()
+        timings = sorted((name for name in stats if name not in self.counts), key=lambda name: -stats[name]['p99'])
+        lines = [f"{name:<24}{1000*stats[name]['p50']:9.2f}{1000*stats[name]['p99']:9.2f} ms" for name in timings]
+        lines += [f"{name:<24}{stats[name]['p50']:9.0f}{stats[name]['max']:9.0f}" for name in self.counts if name in stats]
+        return [f"{'':<24}{'p50':>9}{'p99/max':>9}"] + lines if lines else []
+
+    # Appends one row per statistic to an open CSV file (the header is written if the file is empty).
+    def write_csv(self, file, step=None):
+        if file.tell() == 0: file.write("wall_time,step,name,n,p50,p99,mean,max,last\n")
+        now = time.time()
+        for name, x in self.stats().items():
+            file.write(f"{now:.3f},{self.steps if step is None else step},{name},{x['n']},{x['p50']:.9g},"
+                       f"{x['p99']:.9g},{x['mean']:.9g},{x['max']:.9g},{x['last']:.9g}\n")
+        file.flush()
+
+
+class Phase:
+    __slots__ = ('profiler', 'name', 'start')
+    def __init__(self, profiler, name):
+        self.profiler, self.name = profiler, name
+    def __enter__(self):
+        self.start = time.perf_counter()
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+
+NO_PHASE = contextlib.nullcontext()
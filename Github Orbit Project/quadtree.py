@@ -0,0 +1,143 @@
+import time
+import numpy as np
+from pairwise import *
+
+"""QuadTree is a 2D Barnes-Hut tree built from a SystemState's position and mass arrays.
+Bodies are sorted by Morton (Z-order) code, so every node of the tree is a contiguous range of the
+sorted bodies and its mass and center of mass come straight from cumulative sums. The tree is then
+walked one level at a time for all bodies at once: a node far enough away (size/distance < theta)
+acts as a single point mass, otherwise it is opened and its children are visited on the next level.
+Bodies in the same leaf are summed pair by pair."""
+class QuadTree:
+    depth = 21                                          # Bits per axis of the Morton codes (2**21 cells across)
+    def __init__(self, s, m, real_diameter, theta=0.5):
+        self.s, self.m, self.D, self.theta = s, m, real_diameter, theta
+        self.N = len(m)
+        self.build()
+
+    def build(self):
+        self.levels = []
+        if not self.N: return
+        lower, upper = self.s.min(axis=0), self.s.max(axis=0)
+        self.width = max(float((upper - lower).max()), 1.0)*(1 + 1e-9)
+        cells = ((self.s - lower)/self.width*2**self.depth).astype(np.int64)
+        cells = np.clip(cells, 0, 2**self.depth - 1)
+        codes = self.interleave(cells[:,0]) | (self.interleave(cells[:,1]) << 1)
+        self.order = np.argsort(codes, kind='stable')
+        self.rank = np.empty(self.N, dtype=np.int64)
+        self.rank[self.order] = np.arange(self.N)
+        codes = codes[self.order]
+        m = self.m[self.order]
+        self.m_cum = np.concatenate([[0], np.cumsum(m)])
+        self.ms_cum = np.concatenate([[[0,0]], np.cumsum(m[:,None]*self.s[self.order], axis=0)])
+        # One entry per level: the sorted-body index where each node starts (lo) and stops (hi)
+        for level in range(self.depth + 1):
+            prefix = codes >> 2*(self.depth - level)
+            lo = np.flatnonzero(np.concatenate([[True], prefix[1:] != prefix[:-1]]))
+            hi = np.append(lo[1:], self.N)
+            self.levels.append((lo, hi))
+            if (hi - lo).max() == 1: break
+
+    # Spreads the bits of x apart so two axes can be interleaved into one Morton code.
+    @staticmethod
+    def interleave(x):
+        x = x & 0x1FFFFF
+        x = (x | (x << 16)) & 0x0000FFFF0000FFFF
+        x = (x | (x << 8)) & 0x00FF00FF00FF00FF
+        x = (x | (x << 4)) & 0x0F0F0F0F0F0F0F0F
+        x = (x | (x << 2)) & 0x3333333333333333
+        x = (x | (x << 1)) & 0x5555555555555555
+        return x
+
+    # Acceleration of every body.
+    def accelerations(self, G):
+        g = np.zeros((self.N, 2))
+        self.touching = np.zeros(self.N, dtype=bool)
+        bodies, nodes = np.arange(self.N), np.zeros(self.N, dtype=np.int64)
+        self.interactions = 0
+        for level, (lo_all, hi_all) in enumerate(self.levels):
+            if not len(bodies): break
+            lo, hi = lo_all[nodes], hi_all[nodes]
+            leaf = (hi - lo == 1) | (level == len(self.levels) - 1)
+            M = self.m_cum[hi] - self.m_cum[lo]
+            com = (self.ms_cum[hi] - self.ms_cum[lo])/M[:,None]
+            r = com - self.s[bodies]
+            d = np.sqrt(r[:,0]**2 + r[:,1]**2)
+            contains = (lo <= self.rank[bodies]) & (self.rank[bodies] < hi)
+            far = ~contains & (self.width/2**level < self.theta*d)
+            point = far & (~leaf | (hi - lo > 1))         # Far nodes act as a single point mass
+            exact = leaf & ~point                         # Leaves are summed body by body
+            descend = ~far & ~leaf
+            self.add(g, bodies[point], r[point], d[point], M[point], G)
+            self.leaf_pairs(g, bodies[exact], lo[exact], hi[exact], G)
+            bodies, nodes = self.open(bodies[descend], lo[descend], hi[descend], level)
+        g[self.touching] = 0
+        return g
+
+    def add(self, g, bodies, r, d, M, G):
+        if not len(bodies): return
+        self.interactions += len(bodies)
+        a = G*M/d**3
+        g[:,0] += np.bincount(bodies, weights=a*r[:,0], minlength=self.N)
+        g[:,1] += np.bincount(bodies, weights=a*r[:,1], minlength=self.N)
+
+    def leaf_pairs(self, g, bodies, lo, hi, G):
+        counts = hi - lo
+        bodies = np.repeat(bodies, counts)
+        others = self.order[np.repeat(lo, counts) + self.ranges(counts)]
+        distinct = bodies != others
+        bodies, others = bodies[distinct], others[distinct]
+        r = self.s[others] - self.s[bodies]
+        d = np.sqrt(r[:,0]**2 + r[:,1]**2)
+        g_pairs, apart = pair_g(r, d, self.D[bodies], self.D[others], self.m[others], G)
+        self.interactions += int(apart.sum())
+        g[:,0] += np.bincount(bodies, weights=g_pairs[:,0], minlength=self.N)
+        g[:,1] += np.bincount(bodies, weights=g_pairs[:,1], minlength=self.N)
+        self.touching |= touching(bodies, others, apart, self.N)
+
+    # Replaces each (body, node) pair with one (body, child) pair per child on the next level.
+    def open(self, bodies, lo, hi, level):
+        if level + 1 >= len(self.levels): return bodies[:0], bodies[:0]
+        child_lo = self.levels[level + 1][0]
+        first, last = np.searchsorted(child_lo, lo), np.searchsorted(child_lo, hi)
+        counts = last - first
+        return np.repeat(bodies, counts), np.repeat(first, counts) + self.ranges(counts)
+
+    # [0,1,..,c0-1, 0,1,..,c1-1, ...] for counts [c0, c1, ...]
+    @staticmethod
+    def ranges(counts):
+        total = counts.sum()
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        return np.arange(total) - starts
+
+
+# Exact direct sum, done a block of rows at a time so large N does not need an (N,N,2) array.
+def direct_accelerations(s, m, real_diameter, G, rows=256):
+    N = len(m)
+    g = np.zeros((N, 2))
+    for start in range(0, N, rows):
+        end = min(start + rows, N)
+        r = s[None,:,:] - s[start:end,None,:]
+        d = np.sqrt(r[...,0]**2 + r[...,1]**2)
+        g_pairs, apart = pair_g(r, d, real_diameter[start:end,None], real_diameter[None,:], m[None,:], G)
+        g[start:end] = g_pairs.sum(axis=1)
+        g[start:end][touching_block(start, end, 0, N, apart)] = 0
+    return g
+
+
+# Compares the Barnes-Hut accelerations of the current state with the exact direct sum.
+def accuracy_report(state, G, theta=0.5):
+    t0 = time.perf_counter()
+    tree = QuadTree(state.s, state.m, state.real_diameter, theta)
+    g_tree = tree.accelerations(G)
+    t1 = time.perf_counter()
+    g_direct = direct_accelerations(state.s, state.m, state.real_diameter, G)
+    t2 = time.perf_counter()
+    g_mag = np.sqrt((g_direct**2).sum(axis=1))
+    error = np.sqrt(((g_tree - g_direct)**2).sum(axis=1))/np.where(g_mag > 0, g_mag, 1)
+    return {'bodies': len(state), 'theta': theta,
+            'interactions': tree.interactions, 'pairs': len(state)*(len(state) - 1),
+            'max_error': float(error.max()) if len(error) else 0.0,
+            'median_error': float(np.median(error)) if len(error) else 0.0,
+            'rms_error': float(np.sqrt((error**2).mean())) if len(error) else 0.0,
+            'tree_seconds': t1 - t0, 'direct_seconds': t2 - t1}
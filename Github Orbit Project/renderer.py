@@ -0,0 +1,65 @@
+from collections import OrderedDict
+import numpy as np
+import pygame
+
+"""Renderer draws every body with the glow of Main.draw in two batched blits per frame.
+Main.draw used to draw each glow layer for all bodies in turn and the body itself last. The glow layers
+get brighter in every colour channel from the outside in, so the layered result equals the channel-wise
+maximum of the layers. Pre-rendered glow sprites are therefore blitted with BLEND_MAX, then the solid
+body discs are blitted over the top. Sprites are cached per (diameter, colour) and the least recently
+used ones are evicted. Bodies whose glow lies entirely off screen are skipped."""
+class Renderer:
+    GLOW = [((0,0,2), 30, False), ((0,0,5), 10, False), ((0,0,30), 4, False), ((0,10,60), 2.5, False),
+            ((10,40,180), 1.6, True), ((110,160,255), 1.2, True)]     # (colour, x diameter, only if diameter > 1)
+    quantum = 0.25                                      # Diameters are rounded to this many pixels to share sprites
+    def __init__(self, size, background=(0,0,0), cache_size=512):
+        self.size, self.background, self.cache_size = size, background, cache_size
+        self.frame = pygame.Surface(size)
+        self.cache = OrderedDict()
+        self.drawn = 0
+
+    def cached(self, key, make):
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        sprite = self.cache[key] = make()
+        if len(self.cache) > self.cache_size: self.cache.popitem(last=False)
+        return sprite
+
+    def glow_sprite(self, d):
+        def make():
+            c = int(np.ceil(30*d)) + 1
+            sprite = pygame.Surface((2*c, 2*c))
+            sprite.fill((0,0,0))
+            for colour, scale, big_only in self.GLOW:
+                if d > 1 or not big_only: pygame.draw.circle(sprite, colour, (c, c), scale*d)
+            return sprite
+        return self.cached(('glow', d), make)
+
+    def core_sprite(self, d, colour):
+        def make():
+            c = int(np.ceil(d)) + 1
+            sprite = pygame.Surface((2*c, 2*c), pygame.SRCALPHA)
+            pygame.draw.circle(sprite, colour, (c, c), d)
+            return sprite
+        return self.cached(('core', d, colour), make)
+
+    # points: (N,2) screen coordinates, diameters: (N,) dot diameters, colours: N RGB tuples.
+    # target: the Surface the frame is copied onto, or None to leave it in self.frame only (see export.py).
+    def draw(self, target, points, diameters, colours):
+        self.frame.fill(self.background)
+        W, H = self.size
+        reach = 30*diameters + 1
+        visible = np.flatnonzero((points[:,0] + reach >= 0) & (points[:,0] - reach < W) &
+                                 (points[:,1] + reach >= 0) & (points[:,1] - reach < H))
+        d = np.maximum(np.round(diameters[visible]/self.quantum)*self.quantum, self.quantum).tolist()
+        x, y = points[visible,0].tolist(), points[visible,1].tolist()
+        glows, cores = [], []
+        for k, ind in enumerate(visible.tolist()):
+            glow, core = self.glow_sprite(d[k]), self.core_sprite(d[k], tuple(colours[ind]))
+            glows.append((glow, (x[k] - glow.get_width()//2, y[k] - glow.get_height()//2), None, pygame.BLEND_MAX))
+            cores.append((core, (x[k] - core.get_width()//2, y[k] - core.get_height()//2)))
+        self.frame.blits(glows, doreturn=False)
+        self.frame.blits(cores, doreturn=False)
+        if target is not None: target.blit(self.frame, (0, 0))
+        self.drawn = len(visible)
@@ -0,0 +1,184 @@
+import argparse
+import json
+import time
+from vector_gravity import *
+from config import *
+
+"""Scenarios are initial systems built in bulk: a generator returns the bodies as a dict of arrays
+    m (N,)  s (N,2)  v (N,2)  avg_density (N,)  colour (N,3)
+parts are joined with combine(), and build() lays them out in a SystemState in one go (SystemState.from_arrays),
+so 10^5 bodies start in well under a second instead of being made one Mass at a time.
+Scenario files come in two forms, both with a header of
+    name, SCREEN_SCALE (simulated region, or null for the default), center_object_ID (or null)
+    .npz    the arrays above (plus ID and group if saved from a running system) and the header as JSON
+    .json   the header plus a list of 'parts', each either a generator call
+            {"generator": "disk", "N": 10000, "seed": 1, ...keyword arguments} or explicit bodies
+            {"bodies": [[m, x, y, vx, vy, avg_density], ...]}; all values in SI units
+The .npz form is compact for large saved systems, the .json form for hand-written ones."""
+AU = Config.AU
+PALETTE = np.array([(250,255,255), (200,240,255)])  # Colours of masses added in Main.event_loop
+STAR = {'m': 1.989*10**30, 'avg_density': 1408, 'colour': (255,255,250)}
+
+
+def bodies(m, s, v, avg_density, colour):
+    N = len(m)
+    return {'m': np.asarray(m, dtype=float), 's': np.asarray(s, dtype=float).reshape(N, 2),
+            'v': np.asarray(v, dtype=float).reshape(N, 2),
+            'avg_density': np.broadcast_to(np.asarray(avg_density, dtype=float), (N,)),
+            'colour': np.broadcast_to(np.asarray(colour, dtype=np.int64), (N, 3))}
+
+def star(m=STAR['m'], s=(0, 0), v=(0, 0), avg_density=STAR['avg_density'], colour=STAR['colour']):
+    return bodies([m], [s], [v], avg_density, colour)
+
+def combine(*parts):
+    return {name: np.concatenate([part[name] for part in parts]) for name in ('m', 's', 'v', 'avg_density', 'colour')}
+
+# Masses bound to a new SystemState holding 'parts'; pass them to Config(input=...).
+def build(*parts):
+    data = combine(*parts)
+    return SystemState.from_arrays(data['m'], data['s'], data['v'], data['avg_density'], data['colour']).masses
+
+def log_uniform(rng, low, high, N):
+    return np.exp(rng.uniform(math.log(low), math.log(high), N))
+
+# Positions and velocities of bodies on Kepler orbits about a mass at the origin (counter-clockwise),
+# from semi-major axis a, eccentricity e, argument of pericentre w and mean anomaly M, for mu = G*(M1 + M2).
+def kepler_states(a, e, w, M, mu):
+    E = M + e*np.sin(M)                             # Eccentric anomaly, by Newton's method
+    for _ in range(20):
+        E -= (E - e*np.sin(E) - M)/(1 - e*np.cos(E))
+    r = a*(1 - e*np.cos(E))
+    x, y = a*(np.cos(E) - e), a*np.sqrt(1 - e**2)*np.sin(E)
+    vx, vy = -np.sqrt(mu*a)/r*np.sin(E), np.sqrt(mu*a)/r*np.sqrt(1 - e**2)*np.cos(E)
+    cos_w, sin_w = np.cos(w), np.sin(w)
+    s = np.stack([x*cos_w - y*sin_w, x*sin_w + y*cos_w], axis=1)
+    v = np.stack([vx*cos_w - vy*sin_w, vx*sin_w + vy*cos_w], axis=1)
+    return s, v
+
+
+# N bodies on Kepler orbits about a central star, with surface density ~ r^-power between r_min and r_max,
+# masses log-uniform in mass_range and eccentricities uniform in [0, e_max]. The star is included unless central_mass=0.
+def keplerian_disk(N, central_mass=STAR['m'], r_min=0.3*AU, r_max=2.5*AU, power=1, mass_range=(10**22, 10**24),
+                   e_max=0, avg_density=2000, seed=0, G=Config.G):
+    rng = np.random.default_rng(seed)
+    u = rng.uniform(0, 1, N)
+    if power == 2: a = r_min*(r_max/r_min)**u
+    else: a = (r_min**(2 - power) + u*(r_max**(2 - power) - r_min**(2 - power)))**(1/(2 - power))
+    m = log_uniform(rng, *mass_range, N)
+    s, v = kepler_states(a, rng.uniform(0, e_max, N), rng.uniform(0, 2*np.pi, N), rng.uniform(0, 2*np.pi, N),
+                         G*(central_mass + m))
+    disk = bodies(m, s, v, avg_density, PALETTE[rng.integers(0, len(PALETTE), N)])
+    return combine(star(central_mass), disk) if central_mass else disk
+
+# A belt of N bodies around a central star at 'radius' with a Gaussian spread 'width', with diameters drawn from
+# dN/dD ~ D^-slope between diameter_range (m) and masses from their diameter and density. Eccentricities are
+# Rayleigh distributed with scale e_scale.
+def belt(N, central_mass=STAR['m'], radius=2*AU, width=0.1*AU, diameter_range=(2*10**6, 2*10**7), slope=3.5,
+         e_scale=0.02, avg_density=2500, seed=0, G=Config.G):
+    rng = np.random.default_rng(seed)
+    low, high = diameter_range[0]**(1 - slope), diameter_range[1]**(1 - slope)
+    D = (low + rng.uniform(0, 1, N)*(high - low))**(1/(1 - slope))
+    m = np.maximum(avg_density*np.pi*D**3/6, 10**22)
+    a = np.abs(rng.normal(radius, width, N))
+    e = np.minimum(rng.rayleigh(e_scale, N), 0.9)
+    s, v = kepler_states(a, e, rng.uniform(0, 2*np.pi, N), rng.uniform(0, 2*np.pi, N), G*(central_mass + m))
+    ring = bodies(m, s, v, avg_density, PALETTE[rng.integers(0, len(PALETTE), N)])
+    return combine(star(central_mass), ring) if central_mass else ring
+
+# A star-less cluster of N bodies with the surface density of a Plummer sphere of scale 'radius' (cut off at
+# r_max), random velocities scaled so the cluster is in virial equilibrium (2 K + W = 0), no net momentum.
+def virial_cluster(N, radius=0.5*AU, r_max=2*AU, mass_range=(10**26, 10**28), center=(0, 0), bulk_velocity=(0, 0),
+                   avg_density=2000, seed=0, G=Config.G):
+    rng = np.random.default_rng(seed)
+    u = rng.uniform(0, r_max**2/(r_max**2 + radius**2), N)
+    r, angle = radius*np.sqrt(u/(1 - u)), rng.uniform(0, 2*np.pi, N)
+    s = np.stack([r*np.cos(angle), r*np.sin(angle)], axis=1)
+    m = log_uniform(rng, *mass_range, N)
+    v = rng.normal(0, 1, (N, 2))
+    v -= (m[:,None]*v).sum(0)/m.sum()
+    K = 0.5*(m*(v**2).sum(1)).sum()
+    if K > 0: v *= np.sqrt(-sampled_potential_energy(m, s, G, rng=rng)/(2*K))
+    return bodies(m, s + center, v + bulk_velocity, avg_density, PALETTE[rng.integers(0, len(PALETTE), N)])
+
+# W = -G sum over pairs of m_i m_j / r_ij, exactly for up to 'pairs' pairs, otherwise estimated from a random sample of them.
+def sampled_potential_energy(m, s, G=Config.G, pairs=10**6, rng=None):
+    N = len(m)
+    total = N*(N - 1)//2
+    if total <= pairs: i, j = np.triu_indices(N, 1)
+    else:
+        rng = rng or np.random.default_rng(0)
+        i, j = rng.integers(0, N, pairs), rng.integers(0, N, pairs)
+        i, j = i[i != j], j[i != j]
+    r = s[j] - s[i]
+    return -G*total*np.mean(m[i]*m[j]/np.sqrt(r[:,0]**2 + r[:,1]**2))
+
+GENERATORS = {'disk': keplerian_disk, 'belt': belt, 'cluster': virial_cluster}
+
+
+def save_scenario(path, data, name="", SCREEN_SCALE=None, center_object_ID=None):
+    header = {'name': name, 'SCREEN_SCALE': SCREEN_SCALE, 'center_object_ID': center_object_ID, 'version': 1}
+    extra = {}
+    if isinstance(data, list):                      # Masses, e.g. a model's current_system
+        extra = {'ID': np.array([n.ID for n in data], dtype=np.int64), 'group': np.array([n.group for n in data], dtype=np.int64)}
+        data = bodies([float(n.m) for n in data], [[float(x) for x in n.s] for n in data], [[float(x) for x in n.v] for n in data],
+                      [float(n.avg_density) for n in data], [n.colour for n in data])
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, header=np.array(json.dumps(header)), m=data['m'], s=data['s'], v=data['v'],
+                            avg_density=data['avg_density'], colour=np.asarray(data['colour'], dtype=np.uint8), **extra)
+
+# Returns (masses, header) for a .npz or .json scenario file.
+def load_scenario(path):
+    if path.endswith('.json'):
+        with open(path) as f: spec = json.load(f)
+        parts = []
+        for part in spec.get('parts', []):
+            if 'generator' in part:
+                part = dict(part)
+                parts.append(GENERATORS[part.pop('generator')](**part))
+            else:
+                rows = np.array(part['bodies'], dtype=float).reshape(-1, 6)
+                parts.append(bodies(rows[:,0], rows[:,1:3], rows[:,3:5], rows[:,5], part.get('colour', PALETTE[0])))
+        header = {name: spec.get(name) for name in ('name', 'SCREEN_SCALE', 'center_object_ID')}
+        return (build(*parts) if parts else []), header
+    with np.load(path) as data:
+        header = json.loads(str(data['header']))
+        state = SystemState.from_arrays(data['m'], data['s'], data['v'], data['avg_density'], data['colour'],
+                                        ID=data['ID'] if 'ID' in data else None, group=data['group'] if 'group' in data else None)
+    return state.masses, header
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a scenario file and time how long it takes to start.")
+    parser.add_argument("generator", choices=sorted(GENERATORS))
+    parser.add_argument("--N", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE", help="generator keyword argument (SI units)")
+    parser.add_argument("--screen-scale", type=float, default=None)
+    parser.add_argument("--output", help=".npz file to write")
+    args = parser.parse_args(argv)
+
+    params = {name: json.loads(value) for name, value in (item.split("=", 1) for item in args.set)}
+    times = {}
+    start = time.perf_counter()
+    data = GENERATORS[args.generator](args.N, seed=args.seed, **params)
+    times['generate'] = time.perf_counter() - start
+    if args.output:
+        start = time.perf_counter()
+        save_scenario(args.output, data, name=args.generator, SCREEN_SCALE=args.screen_scale)
+        times['save'] = time.perf_counter() - start
+        start = time.perf_counter()
+        masses, header = load_scenario(args.output)
+        times['load'] = time.perf_counter() - start
+    else:
+        start = time.perf_counter()
+        masses = build(data)
+        times['build'] = time.perf_counter() - start
+    start = time.perf_counter()
+    settings = {'SCREEN_SCALE': args.screen_scale} if args.screen_scale else {}
+    VectorGravitation(Config(input=masses, **settings)).mass_network()
+    times['engine'] = time.perf_counter() - start
+    print(json.dumps({'generator': args.generator, 'bodies': len(masses), 'seconds': times}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import itertools
+import numpy as np
+from mass import *
+
+"""SystemState stores the numeric data of every Mass as contiguous structure-of-arrays rows.
+Bound Mass instances become lightweight views onto a row, so the rest of the program can keep
+using n.s, n.v, n.m etc. while the physics is done in batched array operations.
+by_id indexes the bound masses by ID and is kept up to date as masses are added and removed."""
+class SystemState:
+    vectors = ('s', 'v', 'p', 'gR', 'individual_position')    # (N,2) arrays
+    scalars = ('m', 'avg_density', 'real_diameter', 'dot_diameter')   # (N,) arrays
+    NO_LOCALE = 2**30                                         # Stands in for Mass.locale = None
+    versions = itertools.count()                              # Every state and every change of its rows gets a new version
+    def __init__(self, masses=()):
+        self.masses = []
+        self.by_id = {}
+        self.version = next(self.versions)
+        for name in self.vectors: setattr(self, name, np.zeros((0,2)))
+        for name in self.scalars: setattr(self, name, np.zeros(0))
+        self.locale = np.zeros((0,2), dtype=np.int64)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.group = np.zeros(0, dtype=np.int64)
+        self.extend(masses)
+
+    def __len__(self):
+        return len(self.m)
+
+    # Builds a state straight from arrays of N bodies, with a Mass bound to each row, without creating the
+    # masses one at a time. colour is one RGB tuple for every body or an (N,3) array. IDs are taken from the
+    # Mass.id counter unless given. Dot and real diameters are found as in Mass.calc_sphere_diam.
+    @classmethod
+    def from_arrays(cls, m, s, v, avg_density, colour=(255,255,255), ID=None, group=None, **rows):
+        state = cls()
+        N = len(m)
+        state.m = np.array(m, dtype=float)
+        assert (state.m >= 10**22).all()                    # As in Mass.assertions
+        state.avg_density = np.broadcast_to(np.asarray(avg_density, dtype=float), (N,)).copy()
+        state.real_diameter = 2*(3*state.m/(4*math.pi*state.avg_density))**(1/3)
+        state.dot_diameter = np.maximum(Mass.scale*state.real_diameter/Mass.distance_unit, 1)
+        state.s, state.v = np.array(s, dtype=float).reshape(N, 2), np.array(v, dtype=float).reshape(N, 2)
+        for name in ('p', 'gR', 'individual_position'):
+            setattr(state, name, np.array(rows[name], dtype=float).reshape(N, 2) if name in rows else np.zeros((N, 2)))
+        state.locale = np.array(rows['locale'], dtype=np.int64).reshape(N, 2) if 'locale' in rows else np.full((N, 2), cls.NO_LOCALE)
+        if ID is None: ID = np.arange(Mass.id, Mass.id + N)
+        state.ids = np.array(ID, dtype=np.int64)
+        if N: Mass.id = max(Mass.id, int(state.ids.max()) + 1)
+        state.group = np.zeros(N, dtype=np.int64) if group is None else np.array(group, dtype=np.int64)
+        colour = np.asarray(colour)
+        colours = [tuple(colour.tolist())]*N if colour.ndim == 1 else [tuple(c) for c in colour.tolist()]
+        state.masses = [Mass.bound(state, k, i, c, g) for k, (i, c, g) in
+                        enumerate(zip(state.ids.tolist(), colours, state.group.tolist()))]
+        state.by_id = dict(zip(state.ids.tolist(), state.masses))
+        state.version = next(cls.versions)
+        return state
+
+    # Any masses appended to self.masses since the last call (e.g. by Main.event_loop) are bound here.
+    def absorb(self):
+        pending = self.masses[len(self):]
+        del self.masses[len(self):]
+        self.extend(pending)
+
+    # Copies the data of each mass into new array rows and binds the mass to them.
+    def extend(self, masses):
+        masses = list(masses)
+        if not len(masses): return
+        rows = {}
+        for name in self.vectors:
+            rows[name] = np.array([self.vector_or_zero(getattr(n, name)) for n in masses], dtype=float)
+        for name in self.scalars:
+            rows[name] = np.array([getattr(n, name) for n in masses], dtype=float)
+        locale = [n.locale if n.locale is not None else [self.NO_LOCALE]*2 for n in masses]
+        for n in masses:
+            if n.state is not None: n.state.release([n])
+        for name in rows: setattr(self, name, np.concatenate([getattr(self, name), rows[name]]))
+        self.locale = np.concatenate([self.locale, np.array(locale, dtype=np.int64).reshape(-1,2)])
+        self.ids = np.concatenate([self.ids, np.array([n.ID for n in masses], dtype=np.int64)])
+        self.group = np.concatenate([self.group, np.array([n.group for n in masses], dtype=np.int64)])
+        for n in masses:
+            for name in self.vectors + self.scalars + ('locale',): setattr(n, '_' + name, None)   # Only the arrays hold the values now
+            n.state, n.index = self, len(self.masses)
+            self.masses.append(n)
+            self.by_id[n.ID] = n
+        self.version = next(self.versions)
+
+    # Keeps only the rows where mask is True. Dropped masses are unbound and keep their final values.
+    def keep(self, mask):
+        mask = np.asarray(mask, dtype=bool)
+        if mask.all(): return []
+        dropped = [n for n, k in zip(self.masses, mask) if not k]
+        self.release(dropped)
+        for name in self.vectors + self.scalars + ('locale', 'ids', 'group'):
+            setattr(self, name, getattr(self, name)[mask])
+        self.masses = [n for n, k in zip(self.masses, mask) if k]
+        for ind, n in enumerate(self.masses): n.index = ind
+        self.version = next(self.versions)
+        return dropped
+
+    # Copies the current row values back into the masses and detaches them from the arrays.
+    def release(self, masses):
+        for n in masses:
+            values = {name: list(getattr(self, name)[n.index]) for name in self.vectors}
+            values.update({name: float(getattr(self, name)[n.index]) for name in self.scalars})
+            values['locale'] = n.locale
+            n.state, n.index = None, None
+            for name in values: setattr(n, name, values[name])
+            if self.by_id.get(n.ID) is n: del self.by_id[n.ID]
+
+    # The bound mass with this ID, or None
+    def find(self, ID):
+        return self.by_id.get(ID)
+
+    @staticmethod
+    def vector_or_zero(value):
+        if value is None or len(value) != 2: return [0,0]
+        return value
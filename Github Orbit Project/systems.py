@@ -0,0 +1,26 @@
+from mass import *
+
+"""Ready-made initial systems. Each call builds fresh Mass instances, so several simulations
+can start from the same system without sharing bodies."""
+AU = 1.496*10**11
+v_Earth = 29789
+v_Merc = 29789*(1/0.378)**0.5
+v_Ven = 29789*(1/0.72)**0.5
+v_Mar = 29789*(1/1.5)**0.5
+v_Jup = 29789*(1/5.2)**0.5
+v_Sat = 29789*(1/9.5)**0.5
+v_Ura = 29789*(1/19)**0.5
+v_Nep = 29789*(1/30)**0.5
+
+def solar_system():
+    return [Mass(m=1.989*10**30, s=[0,0],       v=[0,0],      colour=(255,255,250), avg_density=1408),
+            Mass(m=3.285*10**23, s=[0.378*AU,0],v=[0,v_Merc], colour=(200,180,0),   avg_density=5429),
+            Mass(m=4.867*10**24, s=[0.72*AU,0], v=[0,v_Ven],  colour=(200,180,0),   avg_density=5243),
+            Mass(m=5.972*10**24, s=[AU,0],      v=[0,v_Earth],colour=(70,160,255),  avg_density=5514),
+            Mass(m=6.389*10**23, s=[-1.5*AU,0], v=[0,-v_Mar], colour=(200,100,60),  avg_density=3934),
+            Mass(m=1.898*10**27, s=[-5.2*AU,0], v=[0,-v_Jup], colour=(200,150,100), avg_density=1326),
+            Mass(m=5.972*10**24, s=[9.5*AU,0],  v=[0,v_Sat],  colour=(150,150,70),  avg_density=687),
+            Mass(m=8.681*10**25, s=[19*AU,0],   v=[0,v_Ura],  colour=(0,100,150),   avg_density=1270),
+            Mass(m=1.024*10**26, s=[30*AU,0],   v=[0,-v_Nep], colour=(0,100,255),   avg_density=1638),]
+
+SYSTEMS = {"solar": solar_system}
@@ -0,0 +1,8 @@
+from headless import *
+from analytics import Analytics
+
+def test_events_are_not_repeated_once_the_system_is_empty():
+    run = Headless(Config(input=[Mass(m=10**25, s=[5*Config.AU, 0], v=[0, 0])]))
+    run.analyse(Analytics(stride=1))
+    for _ in range(5): run.step()
+    assert [event['type'] for event in run.analytics.events] == ['ejection']
@@ -0,0 +1,80 @@
+from gravity import *
+from vector_gravity import *
+from systems import *
+from config import *
+
+"""Regression tests: VectorGravitation must follow the trajectories of the original Gravitation."""
+def run(engine, steps, **settings):
+    Mass.id = 0                                     # Both engines get the same IDs
+    model = engine(Config(input=solar_system(), **settings))
+    for _ in range(steps): model.step()
+    return model
+
+def test_vector_engine_matches_list_engine_on_solar_system():
+    old, new = run(Gravitation, 2000), run(VectorGravitation, 2000)
+    assert [n.ID for n in old.current_system] == new.state.ids.tolist()
+    assert np.array_equal(np.array([n.s for n in old.current_system], dtype=float), new.state.s)
+
+def test_adaptive_time_step_with_coincident_bodies():
+    masses = [Mass(m=10**26, s=[AU, 0], v=[0, 10**4]), Mass(m=10**26, s=[AU, 0], v=[0, 10**4])]
+    model = VectorGravitation(Config(input=masses, ADAPTIVE=True))
+    model.step()
+    assert model.dT == Config.MIN_TIME_STEP
+
+def test_collision_frame_suspends_gravity_for_every_integrator():
+    for integrator in INTEGRATORS:
+        Mass.id = 0
+        masses = solar_system() + [Mass(m=10**25, s=[-AU, 0], v=[0, 0]), Mass(m=10**25, s=[-AU + 10**6, 0], v=[0, 0])]
+        model = VectorGravitation(Config(input=masses, INTEGRATOR=integrator))
+        earth = model.find(3)
+        v = list(earth.v)
+        model.step()
+        assert len(model.merged) == 1, integrator
+        assert list(earth.v) == v, integrator
+
+def test_parallel_forces_follow_the_serial_trajectory():
+    from scenarios import build, virial_cluster
+    runs = []
+    for workers in (1, 2):
+        Mass.id = 0
+        model = VectorGravitation(Config(input=build(virial_cluster(300, seed=1)), WORKERS=workers))
+        for _ in range(50): model.step()
+        if model.forces is not None: model.forces.close()
+        runs.append(model.state)
+    assert runs[0].ids.tolist() == runs[1].ids.tolist()
+    assert np.array_equal(runs[0].s, runs[1].s)
+
+def test_every_force_calculation_applies_the_contact_rules():
+    from scenarios import build, virial_cluster
+    state = SystemState(build(virial_cluster(1000, seed=2)))
+    D = state.real_diameter*30                      # Enlarged so that many bodies touch
+    exact = direct_accelerations(state.s, state.m, D, Config.G)
+    forces = ParallelForces(2)
+    parallel = forces.accelerations(state.s, state.m, D, Config.G)
+    forces.close()
+    tree = QuadTree(state.s, state.m, D, theta=0).accelerations(Config.G)
+    touching = (exact == 0).all(axis=1)
+    assert 0 < touching.sum() < len(state)
+    for g in (parallel, tree):
+        assert np.array_equal((g == 0).all(axis=1), touching)
+        assert np.allclose(g, exact, rtol=1e-12, atol=0)
+
+def test_chain_of_contacts_merges_into_one_cluster():
+    masses = [Mass(m=k*10**25, s=[AU, 0], v=[0, 3*k]) for k in range(1, 5)]
+    D = np.array([n.real_diameter for n in masses])
+    x = AU + np.concatenate([[0], np.cumsum(0.9*(D[1:] + D[:-1])/2)])   # Each body just inside the reach of the next
+    for n, x_k in zip(masses, x): n.s = [x_k, 0]
+    speed = np.array([np.hypot(*n.v) for n in masses])
+    LIMIT = (D[:,None] + D[None,:])/2 + (speed[:,None] + speed[None,:])*VectorGravitation.collision_window
+    apart = np.abs(x[:,None] - x[None,:]) > LIMIT
+    assert apart[np.abs(np.subtract.outer(range(4), range(4))) > 1].all()   # Only neighbours are in contact
+    IDs = [n.ID for n in masses]
+    m, p = sum(float(n.m) for n in masses), np.sum([float(n.m)*np.array(n.v) for n in masses], axis=0)
+    model = VectorGravitation(Config(input=masses))
+    model.step()
+    assert len(model.merged) == 1
+    M, cluster = model.merged[0]
+    assert [n.ID for n in cluster] == IDs
+    assert model.state.ids.tolist() == [M.ID]
+    assert model.state.m.sum() == m
+    assert np.allclose((model.state.m[:,None]*model.state.v).sum(0), p, rtol=1e-12, atol=0)
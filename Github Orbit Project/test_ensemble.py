@@ -0,0 +1,5 @@
+from ensemble import *
+
+def test_pooled_members_with_parallel_forces():
+    outcomes = Ensemble(steps=5, processes=2, WORKERS=2).run([{'seed': 0}, {'seed': 1}])
+    assert [outcome['member']['seed'] for outcome in outcomes] == [0, 1]
@@ -0,0 +1,43 @@
+from headless import *
+from scenarios import build, virial_cluster
+
+def cluster(integrator):
+    Mass.id = 0                                     # As in a new process
+    return Config(input=build(virial_cluster(200, seed=3)), INTEGRATOR=integrator)
+
+def test_restored_run_follows_the_uninterrupted_run(tmp_path):
+    for integrator in INTEGRATORS:
+        straight = Headless(cluster(integrator))
+        for _ in range(200): straight.step()
+        first = Headless(cluster(integrator))
+        for _ in range(100): first.step()
+        first.save(tmp_path/"run.npz")
+        Mass.id = 0
+        resumed = Headless.restore(tmp_path/"run.npz", cluster(integrator))
+        for _ in range(100): resumed.step()
+        assert len(straight.model.state) < 200, integrator       # Some bodies merged, so new IDs were given out
+        assert straight.model.state.ids.tolist() == resumed.model.state.ids.tolist(), integrator
+        assert np.array_equal(straight.model.state.s, resumed.model.state.s), integrator
+        assert resumed.time_elapsed == straight.time_elapsed, integrator
+
+def test_trajectory_frames_slices_and_bodies(tmp_path):
+    run = Headless(Config(input=solar_system()))
+    frames = []
+    with TrajectoryWriter(tmp_path/"trajectory", chunk_rows=20) as writer:
+        run.record(writer)
+        for _ in range(10):
+            run.step()
+            frames.append((run.time_elapsed, run.model.state.ids.copy(), run.model.state.s.copy()))
+    reader = TrajectoryReader(tmp_path/"trajectory")
+    assert len(reader) == len(frames)
+    for k, (time, ID, s) in enumerate(frames):
+        frame = reader.frame(k)
+        assert frame['time'] == time
+        assert np.array_equal(frame['ID'], ID) and np.array_equal(frame['s'], s)
+    rows = reader.slice(frames[2][0], frames[5][0])
+    assert np.array_equal(np.unique(rows['time']), [frames[k][0] for k in range(2, 6)])
+    assert len(rows['ID']) == sum(len(frames[k][1]) for k in range(2, 6))
+    earth = frames[0][1][3]
+    rows = reader.body(earth)
+    assert np.array_equal(rows['time'], [time for time, _, _ in frames])
+    assert np.array_equal(rows['s'], [s[ID == earth][0] for _, ID, s in frames])
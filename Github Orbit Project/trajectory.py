@@ -0,0 +1,117 @@
+import json
+import os
+import numpy as np
+
+"""Trajectories are written to a directory of flat binary column files, one row per body per frame:
+    ID.bin (int64)  m.bin  s.bin (x, y)  v.bin (x, y)  avg_density.bin  colour.bin (uint8 r, g, b)
+                    -- rows of all frames, one frame after another (trajectories written before avg_density
+                       and colour were added have only the first four)
+    frames.bin      -- per frame: time, first row, number of rows
+    meta.json       -- float dtype and the columns present
+Rows are buffered and appended a chunk at a time, so a run can write millions of frames while only one
+chunk is held in memory. Every column can be memory-mapped, so reading a time range or a single body
+only touches the part of the files that is needed."""
+class TrajectoryWriter:
+    frame_dtype = np.dtype([('time', 'f8'), ('first', 'i8'), ('count', 'i8')])
+    columns = ('ID', 'm', 's', 'v', 'avg_density', 'colour')
+    def __init__(self, path, chunk_rows=65536, dtype='f8'):
+        self.path, self.chunk_rows = path, chunk_rows
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):                   # Appending to an earlier run (e.g. after a restore)
+            with open(meta_path) as f: meta = json.load(f)
+            dtype, self.columns = meta['dtype'], tuple(meta.get('columns', self.columns[:4]))
+        else:
+            with open(meta_path, 'w') as f: json.dump({'dtype': np.dtype(dtype).str, 'columns': self.columns, 'version': 2}, f)
+        self.dtype = np.dtype(dtype)
+        self.files = {name: open(os.path.join(path, name + '.bin'), 'ab') for name in self.columns + ('frames',)}
+        self.rows = os.path.getsize(os.path.join(path, 'ID.bin'))//8
+        self.buffer, self.buffered, self.frames = {name: [] for name in self.columns}, 0, []
+        self.colours = (None, None)                     # (state version, colour rows), as colours only change with the bodies
+
+    def write(self, model, time):
+        state = model.state
+        state.absorb()
+        self.frames.append((time, self.rows, len(state)))
+        self.rows += len(state)
+        self.buffer['ID'].append(state.ids.astype(np.int64))
+        self.buffer['m'].append(state.m.astype(self.dtype))
+        self.buffer['s'].append(state.s.astype(self.dtype))
+        self.buffer['v'].append(state.v.astype(self.dtype))
+        if 'avg_density' in self.buffer: self.buffer['avg_density'].append(state.avg_density.astype(self.dtype))
+        if 'colour' in self.buffer:
+            if self.colours[0] != state.version:
+                self.colours = (state.version, np.array([n.colour for n in state.masses], dtype=np.uint8).reshape(-1, 3))
+            self.buffer['colour'].append(self.colours[1])
+        self.buffered += len(state)
+        if self.buffered >= self.chunk_rows: self.flush()
+
+    def flush(self):
+        for name, parts in self.buffer.items():
+            if parts: self.files[name].write(np.concatenate(parts).tobytes())
+            parts.clear()
+        if self.frames: self.files['frames'].write(np.array(self.frames, dtype=self.frame_dtype).tobytes())
+        self.frames, self.buffered = [], 0
+        for f in self.files.values(): f.flush()
+
+    def close(self):
+        self.flush()
+        for f in self.files.values(): f.close()
+
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryReader:
+    def __init__(self, path):
+        with open(os.path.join(path, 'meta.json')) as f: meta = json.load(f)
+        self.dtype = np.dtype(meta['dtype'])
+        self.columns = tuple(meta.get('columns', TrajectoryWriter.columns[:4]))
+        self.frames = self.column(path, 'frames', TrajectoryWriter.frame_dtype)
+        self.ID = self.column(path, 'ID', np.int64)
+        self.m = self.column(path, 'm', self.dtype)
+        self.s = self.column(path, 's', self.dtype, 2)
+        self.v = self.column(path, 'v', self.dtype, 2)
+        self.avg_density = self.column(path, 'avg_density', self.dtype) if 'avg_density' in self.columns else None
+        self.colour = self.column(path, 'colour', np.uint8, 3) if 'colour' in self.columns else None
+        self.times = self.frames['time']
+
+    @staticmethod
+    def column(path, name, dtype, width=1):
+        file = os.path.join(path, name + '.bin')
+        dtype = np.dtype(dtype)
+        if not os.path.getsize(file): return np.zeros((0, width) if width > 1 else 0, dtype=dtype)
+        data = np.memmap(file, dtype=dtype, mode='r')
+        return data.reshape(-1, width) if width > 1 else data
+
+    def __len__(self):
+        return len(self.frames)
+
+    # Rows of one frame as a dict of arrays (with avg_density and colour if the trajectory has them).
+    def frame(self, k):
+        first, count = int(self.frames['first'][k]), int(self.frames['count'][k])
+        rows = slice(first, first + count)
+        frame = {'time': float(self.times[k]), 'ID': self.ID[rows], 'm': self.m[rows], 's': self.s[rows], 'v': self.v[rows]}
+        if self.avg_density is not None: frame['avg_density'] = self.avg_density[rows]
+        if self.colour is not None: frame['colour'] = self.colour[rows]
+        return frame
+
+    # All rows with t0 <= time <= t1, optionally only those of the given body IDs. Each row also gets its frame's time.
+    def slice(self, t0=None, t1=None, IDs=None):
+        k0 = 0 if t0 is None else int(np.searchsorted(self.times, t0, side='left'))
+        k1 = len(self.frames) if t1 is None else int(np.searchsorted(self.times, t1, side='right'))
+        if k1 <= k0: return {'time': np.zeros(0), 'ID': self.ID[:0], 'm': self.m[:0], 's': self.s[:0], 'v': self.v[:0]}
+        first = int(self.frames['first'][k0])
+        last = int(self.frames['first'][k1 - 1] + self.frames['count'][k1 - 1])
+        counts = np.asarray(self.frames['count'][k0:k1])
+        time = np.repeat(np.asarray(self.times[k0:k1]), counts)
+        rows = np.arange(first, last)
+        if IDs is not None:
+            keep = np.isin(self.ID[first:last], IDs)
+            rows, time = rows[keep], time[keep]
+        return {'time': time, 'ID': self.ID[rows], 'm': self.m[rows], 's': self.s[rows], 'v': self.v[rows]}
+
+    def body(self, ID, t0=None, t1=None):
+        return self.slice(t0, t1, IDs=[ID])
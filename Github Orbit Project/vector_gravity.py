@@ -0,0 +1,209 @@
+from gravity import *
+from system_state import *
+from quadtree import *
+from pairwise import *
+from collisions import *
+from integrators import *
+from parallel import ParallelForces
+
+"""VectorGravitation runs the same eleven steps as Gravitation, but on the contiguous arrays of a
+SystemState instead of per-Mass Python lists. Neighbours are implicit (every other row), so no
+Mass.others / Mass.r / Mass.r_mag / Mass.g lists are built, and nothing is allocated per Mass in a
+frame without collisions. The direct sum goes a block of rows at a time, so no (N,N) arrays are built either.
+With Main.SOLVER = "tree", steps 3. to 5. use a Barnes-Hut QuadTree (opening angle Main.THETA)
+instead of the exact direct sum.
+Steps 7. and 8. are done by the integrator named by Main.INTEGRATOR, and with Main.ADAPTIVE the
+extra choose_time_step stage shrinks dT during close encounters. With Main.WORKERS > 1 the direct
+sum is split over a pool of processes (ParallelForces)."""
+class VectorGravitation(Gravitation):
+    collision_window = 5000                             # Seconds of travel allowed for in the contact test, see Gravitation.remove_collided
+    stages = Gravitation.stages[:6] + ('choose_time_step',) + Gravitation.stages[6:]
+    def __init__(self,main):
+        self.state, self.clusters, self.tree = SystemState(), [], None
+        self.escaped, self.merged = [], []              # Masses that left the simulated region / (new Mass, cluster) pairs, last frame
+        self.lineage = {}                               # ID of a merged mass: ID of the mass it merged into
+        self.ids_version = None                         # SystemState.version new_ids was last built for
+        self.suspended = None                           # Rows whose gravity remove_collided suspended this frame (bool array)
+        super().__init__(main)
+        self.integrator = INTEGRATORS[main.INTEGRATOR](self)
+        self.forces = ParallelForces(main.WORKERS) if main.WORKERS > 1 and main.SOLVER != "tree" else None
+
+    @property
+    def current_system(self):
+        return self.state.masses
+    @current_system.setter
+    def current_system(self, masses):
+        if masses is self.state.masses: return
+        if len(masses) and masses[0].state is not None and masses is masses[0].state.masses:
+            self.state = masses[0].state                # Already laid out in arrays, e.g. by SystemState.from_arrays
+        else: self.state = SystemState(masses)
+
+    # 1. Bodies that have crossed the edge of the simulated region are dropped, found in one O(N) pass over
+    # squared distances. New masses added since the last frame are bound first. The arrays only change size
+    # when bodies are added, merge or escape, and SystemState.version marks each such change, so structures
+    # built on the rows (e.g. BatchedGravitation's pair lists) are only rebuilt then.
+    def mass_network(self):
+        self.state.absorb()
+        self.escaped = []
+        if self.main.center_object_ID is None:
+            s = self.state.s
+            self.escaped = self.state.keep(s[:,0]**2 + s[:,1]**2 <= float(self.domain_limit())**2)
+        self.map = self.state.masses
+
+    # 2. Every other row of the arrays is a neighbour, so there is nothing to build.
+    def get_neighbours(self):
+        self.others = None
+
+    # 3. With Main.SOLVER = "tree" the QuadTree is built here. The direct sum finds r a block of rows at a time in 5.
+    def r_vectors(self):
+        self.tree = None
+        if self.main.SOLVER == "tree":
+            self.tree = QuadTree(self.state.s, self.state.m, self.state.real_diameter, self.main.THETA)
+
+    # 4. Found with r in 5.
+    def R_mag(self):
+        pass
+
+    # 5. The resultant g of every body, from the tree, the process pool or direct_accelerations.
+    def g_vectors(self):
+        if self.tree is not None: self.g = self.tree.accelerations(self.main.G)
+        else: self.g = self.accelerations(self.state.s)
+
+    # 6.
+    def resultant_g(self):
+        self.state.gR[:] = self.g
+
+    # Adaptive time step. For every pair that could come close within one full step, the crossing time d/|v_rel|
+    # and the free-fall time (d^3/G(m_i+m_j))^0.5 are found; dT is Main.ETA times the smallest of them,
+    # kept between Main.MIN_TIME_STEP and the configured step. Without Main.ADAPTIVE dT stays fixed.
+    def choose_time_step(self):
+        dT_max = Gravitation.time_step*self.main.TIME_LAPSE
+        self.dT = dT_max
+        if not self.main.ADAPTIVE or len(self.state) < 2: return
+        state = self.state
+        speed = np.sqrt(state.v[:,0]**2 + state.v[:,1]**2)
+        i, j = self.near_pairs(state.real_diameter/2 + speed*abs(dT_max))
+        if not len(i): return
+        r, dv = state.s[j] - state.s[i], state.v[j] - state.v[i]
+        d = np.sqrt(r[:,0]**2 + r[:,1]**2)
+        dv_mag = np.sqrt(dv[:,0]**2 + dv[:,1]**2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossing = np.where(dv_mag > 0, d/dv_mag, np.inf)   # Pairs not moving apart never cross (and 0/0 would be NaN)
+        free_fall = np.sqrt(d**3/(self.main.G*(state.m[i] + state.m[j])))
+        dT = self.main.ETA*min(crossing.min(), free_fall.min())
+        self.dT = np.sign(dT_max)*float(np.clip(dT, self.main.MIN_TIME_STEP, abs(dT_max)))
+
+    # Pairs of bodies whose reach overlaps, from the SpatialHash broad phase.
+    def near_pairs(self, reach):
+        return SpatialHash(self.state.s, reach).pairs()
+
+    # Rows whose gravity is suspended for the frame when the given bodies collide.
+    def affected(self, colliding):
+        return slice(None)
+
+    # Acceleration of every body if the masses were at positions s, from the selected solver.
+    def accelerations(self, s):
+        state = self.state
+        if self.main.SOLVER == "tree":
+            return QuadTree(s, state.m, state.real_diameter, self.main.THETA).accelerations(self.main.G)
+        if self.forces is not None:
+            return self.forces.accelerations(s, state.m, state.real_diameter, self.main.G)
+        return direct_accelerations(s, state.m, state.real_diameter, self.main.G)
+
+    # 7.
+    def calc_velocity(self):
+        self.integrator.velocity(self.dT)
+
+    # 8.
+    def reposition(self):
+        self.integrator.position(self.dT)
+        s = self.state.s
+        self.state.p[:] = self.state.m[:,None]*self.state.v
+        W, H = self.main.screen_width, self.main.screen_height
+        self.state.individual_position[:,0] = 0.5*W*s[:,0] + 0.5*W
+        self.state.individual_position[:,1] = -0.5*W*s[:,1] + 0.5*H
+
+    # 9. Broad phase: a SpatialHash pairs up bodies whose reach (radius plus distance covered in the collision
+    # window) overlaps. Narrow phase: the contact test of Gravitation.remove_collided on those pairs only.
+    # Touching pairs are joined with UnionFind, so pileups of three or more masses form one cluster.
+    # The rows whose gravity is suspended are kept in self.suspended, so integrators that evaluate forces
+    # again later in the frame (leapfrog, RK4) suspend them too.
+    def remove_collided(self):
+        state = self.state
+        window = max(self.collision_window, abs(self.dT))  # Longer steps need a longer window so bodies can't pass through each other
+        speed = np.abs(state.v)
+        reach = state.real_diameter/2 + np.sqrt(speed[:,0]**2 + speed[:,1]**2)*window
+        i, j = self.near_pairs(reach)
+        same_locale = (state.locale[i] == state.locale[j]).all(axis=1)
+        vf = np.where(same_locale[:,None], speed[i] + speed[j], 0)
+        vf_mag = np.sqrt(vf[:,0]**2 + vf[:,1]**2)
+        LIMIT = (state.real_diameter[i] + state.real_diameter[j])/2 + vf_mag*window
+        r = state.s[j] - state.s[i]
+        hit = np.sqrt(r[:,0]**2 + r[:,1]**2) < LIMIT
+        self.clusters, self.suspended = [], None
+        if hit.any():
+            suspended = np.zeros(len(state), dtype=bool)
+            suspended[self.affected(i[hit])] = True
+            state.gR[suspended] = 0                         # All net gravity temporarily suspended to while dealing with collisions
+            joined = UnionFind()
+            for a, b in zip(i[hit].tolist(), j[hit].tolist()): joined.union(a, b)
+            self.clusters = [[state.masses[k] for k in sorted(group)] for group in joined.groups()]
+            keep = np.ones(len(state), dtype=bool)
+            keep[list(joined.parent)] = False
+            self.removed = state.keep(keep)
+            self.suspended = suspended[keep]
+
+    # 10. Each cluster is replaced by one Mass, conserving mass and momentum as in Gravitation.combine_removed_masses.
+    def combine_removed_masses(self):
+        appended = []
+        for cluster in self.clusters:
+            masses_collected = [n.m for n in cluster]
+            self.substitute_colour = cluster[masses_collected.index(max(masses_collected))].colour
+            m_total = sum(masses_collected)
+            CoM = [sum([n.s[j]*n.m for n in cluster])/m_total for j in range(2)]
+            v_final = [sum([n.m*n.v[j] for n in cluster])/m_total for j in range(2)]
+            avg_density = sum([n.avg_density*n.m for n in cluster])/m_total
+            M = Mass(m=m_total, s=CoM, v=v_final, colour=self.substitute_colour, avg_density=avg_density)
+            M.gR=[0,0]
+            M.group = cluster[0].group
+            if self.main.center_object_ID in [n.ID for n in cluster]:
+                M.ID = self.main.center_object_ID
+            appended.append(M)
+        for M, cluster in zip(appended, self.clusters):
+            for n in cluster:
+                if n.ID != M.ID: self.lineage[n.ID] = M.ID
+        self.merged = list(zip(appended, self.clusters))
+        self.state.extend(appended)
+        if self.suspended is not None: self.suspended = np.concatenate([self.suspended, np.ones(len(appended), dtype=bool)])
+        self.rem_ids = [j.ID for j in self.removed]
+        if self.ids_version != self.state.version:       # Only rebuilt when bodies were added or removed
+            self.new_ids, self.ids_version = self.state.ids.tolist(), self.state.version
+        self.removed, self.clusters = [], []
+
+    # ID of the body that the body 'ID' has ended up in after any number of mergers ('ID' if it never merged).
+    # Chains are shortened as they are followed, so repeated lookups take constant time.
+    def descendant(self, ID):
+        path = []
+        while ID in self.lineage:
+            path.append(ID)
+            ID = self.lineage[ID]
+        for k in path[:-1]: self.lineage[k] = ID
+        return ID
+
+    # The mass with this ID, or with follow=True the mass it has since merged into; None if it is gone.
+    def find(self, ID, follow=False):
+        return self.state.find(self.descendant(ID) if follow else ID)
+
+    def interactions(self):
+        if self.tree is not None: return self.tree.interactions
+        return super().interactions()
+
+    def accuracy_report(self):
+        return accuracy_report(self.state, self.main.G, self.main.THETA)
+
+    # 11.
+    def object_locale_data(self):
+        s = self.state.s
+        with np.errstate(divide='ignore', invalid='ignore'):
+            locale = np.where(s != 0, np.sign(s)*np.round(np.log10(np.abs(s))), 0).astype(np.int64)
+        self.state.locale = locale